@@ -1,6 +1,7 @@
 # main.py
 
 import sys
+import multiprocessing
 from steam_fetcher.gui import start_gui # Import the GUI starter function
 # from steam_fetcher.data_handler import DataHandler # Keep for later
 
@@ -11,4 +12,5 @@ def main():
     start_gui()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support() # The CSV upload runs in a child process
     main()
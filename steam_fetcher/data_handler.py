@@ -4,13 +4,133 @@ import pyodbc
 import pymongo
 from pymongo import UpdateOne
 import os
-from azure.identity import DefaultAzureCredential, DeviceCodeCredential
+from azure.identity import (
+    AzureCliCredential,
+    ChainedTokenCredential,
+    DeviceCodeCredential,
+    EnvironmentCredential,
+    TokenCachePersistenceOptions,
+)
 import struct
+import time
+import collections
+import functools
+import operator
+from dataclasses import dataclass
 import asyncio
-from playwright.async_api import async_playwright
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+
+# --- Logging ---
+# Records are queued by the scraping code and written by a listener thread,
+# so console I/O never blocks the event loop.
+log = logging.getLogger("steamfetcher")
+if not log.handlers:
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    _log_queue = queue.SimpleQueue()
+    log.addHandler(logging.handlers.QueueHandler(_log_queue))
+    _log_listener = logging.handlers.QueueListener(_log_queue, logging.StreamHandler(sys.stdout))
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+
+# Let the ODBC driver manager pool connections (must be set before the first connect)
+pyodbc.pooling = True
 
 # --- Configuration ---
 CONFIG_FILE = 'config.ini'
+SQL_RESOURCE_URI = "https://database.windows.net/.default" # The resource URI for Azure SQL Database
+TOKEN_REFRESH_MARGIN = 300 # Seconds before expiry at which a cached token is refreshed
+TOKEN_CACHE_NAME = "steamfetcher" # Name of the persistent MSAL token cache
+SQL_FETCH_BATCH_SIZE = 10000 # Rows pulled per fetchmany() call
+SQL_PACKET_SIZE = 32768 # TDS packet size in bytes (driver default is 4096)
+SQL_ATTR_PACKET_SIZE = 112 # ODBC pre-connect attribute carrying SQL_PACKET_SIZE
+SQL_COPT_SS_ACCESS_TOKEN = 1256 # msodbcsql pre-connect attribute carrying the Azure AD token
+
+# In-page predicate: true once any grid row's title cell exactly (case-insensitively) matches the title
+SEARCH_MATCH_JS = """
+([expected, titleIndex]) => {
+    const target = expected.trim().toLowerCase();
+    const rows = document.querySelectorAll("div[role='grid'] div[role='row']");
+    return Array.from(rows).some(row => {
+        const cell = row.querySelectorAll("div[role='gridcell']")[titleIndex];
+        return cell !== undefined && cell.innerText.trim().toLowerCase() === target;
+    });
+}
+"""
+
+# In-page extraction of every rendered grid row as [aria-rowindex, title, class] (full grid or filtered results)
+GRID_SNAPSHOT_JS = """
+(titleIndex) => Array.from(document.querySelectorAll("div[role='grid'] div[role='row'][aria-rowindex]")).map(row => {
+    const cell = row.querySelectorAll("div[role='gridcell']")[titleIndex];
+    return [row.getAttribute("aria-rowindex"), cell ? cell.innerText.trim() : "", row.className];
+})
+"""
+
+# Total rows the grid reports (header included), 0 if it does not expose aria-rowcount
+GRID_ROW_COUNT_JS = "g => parseInt(g.getAttribute('aria-rowcount'), 10) || 0"
+
+AUTH_STATE_FILE = 'checkmydeck_auth.json' # Saved browser session reused by the headless scrape contexts
+AUTH_USER_AGENT_FILE = 'checkmydeck_auth_user_agent.txt' # User agent of the browser that created the session
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media"} # Not needed to read the grid
+
+MONGO_BATCH_SIZE = 1000 # Upserts sent per bulk_write call
+MONGO_FLUSH_DOCS = 500 # Scraped documents buffered before a write during a run
+MONGO_FLUSH_SECONDS = 2 # Max time scraped documents wait in the buffer
+# Upsert key: every stored field, as the query may return one TitleID with several ProductIDs/publishers
+MONGO_KEY_FIELDS = [(field, pymongo.ASCENDING) for field in
+                    ('TitleID', 'ProductID', 'PublisherName', 'PublisherType', 'TitleName', 'SteamOSResult')]
+LEGACY_MONGO_INDEX = "TitleID_1_SteamOSResult_1" # Earlier, too narrow unique index; dropped if present
+
+@dataclass(frozen=True, slots=True)
+class _AppConfig:
+    """Validated connection details and query from config.ini."""
+    sql_server: str
+    sql_database: str
+    sql_query: str
+    mongo_uri: str
+    mongo_db: str
+    mongo_collection: str
+
+@functools.lru_cache(maxsize=1)
+def _load_config():
+    """
+    Reads and validates config.ini once per process. Raises ValueError if the
+    file is missing or invalid (failures are not cached, so a fixed file is
+    picked up on the next attempt).
+    """
+    if not os.path.exists(CONFIG_FILE):
+        log.error(f"🚨 Error: Configuration file '{CONFIG_FILE}' not found.")
+        raise ValueError(f"Configuration file '{CONFIG_FILE}' not found.")
+    try:
+        config = configparser.ConfigParser()
+        config.read(CONFIG_FILE)
+    except configparser.Error as e:
+        log.error(f"🚨 Error reading configuration file: {e}")
+        raise ValueError(f"Failed to parse configuration file: {e}") from e
+    # Basic validation
+    if 'SQLServer' not in config or 'MongoDB' not in config:
+        log.error("🚨 Error: Config file must contain [SQLServer] and [MongoDB] sections.")
+        raise ValueError("Config file must contain [SQLServer] and [MongoDB] sections.")
+    if not all(k in config['SQLServer'] for k in ['server', 'database', 'query']):
+         log.error("🚨 Error: [SQLServer] section missing server, database, or query.")
+         raise ValueError("[SQLServer] section missing server, database, or query.")
+    if not all(k in config['MongoDB'] for k in ['uri', 'database', 'collection']):
+         log.error("🚨 Error: [MongoDB] section missing uri, database, or collection.")
+         raise ValueError("[MongoDB] section missing uri, database, or collection.")
+    log.info("✅ Configuration loaded successfully.")
+    return _AppConfig(
+        sql_server=config['SQLServer']['server'],
+        sql_database=config['SQLServer']['database'],
+        sql_query=config['SQLServer']['query'],
+        mongo_uri=config['MongoDB']['uri'],
+        mongo_db=config['MongoDB']['database'],
+        mongo_collection=config['MongoDB']['collection'],
+    )
 
 class DatabaseHandler:
     """
@@ -19,48 +139,66 @@ class DatabaseHandler:
     specified fields plus the scraped result to MongoDB.
     """
 
+    # Fields copied from each SQL row into its MongoDB document
+    REQUIRED_MONGO_FIELDS = ('TitleName', 'TitleID', 'PublisherName', 'ProductID', 'PublisherType')
+    _get_mongo_fields = staticmethod(operator.attrgetter(*REQUIRED_MONGO_FIELDS))
+
     def __init__(self):
-        self.config = self._read_config()
-        if not self.config:
-            raise ValueError("Failed to read or parse configuration file.")
+        self.cfg = _load_config() # Raises ValueError if config.ini is missing or invalid
         # Constants from config for scraping
         self.login_wait = 60000
-        self.search_wait = 3000
+        self.search_wait = 5000 # Max wait (ms) for the filtered grid to show the searched title
         self.web_title_cell_index = 1 # Index of Title cell in web grid
+        self.scrape_concurrency = 5 # Number of browser contexts searching in parallel
+        self._context_pool = None # asyncio.Queue of ready (context, page, search_box) entries during a run
+        self.grid_snapshot_min_titles = 500 # From this many titles, read the whole grid once instead of searching each
+        self.grid_scroll_wait = 500 # Wait (ms) for the grid to render rows after each scroll while reading it
+        # Azure AD credential, token and SQL connection are reused across runs
+        # Silent sources (Azure CLI login, environment) are tried first; Device Code is the
+        # interactive fallback, and its tokens persist on disk so reruns skip the prompt.
+        self._credential = ChainedTokenCredential(
+            AzureCliCredential(),
+            EnvironmentCredential(),
+            DeviceCodeCredential(cache_persistence_options=TokenCachePersistenceOptions(name=TOKEN_CACHE_NAME)),
+        )
+        self._sql_token = None
+        self._sql_conn = None
+        self._mongo_client = None # Created lazily by _get_mongo_client
+        self._mongo_index_ready = False # Unique key index ensured once per handler
 
-    def _read_config(self):
-        """Reads connection details and query from config.ini."""
-        if not os.path.exists(CONFIG_FILE):
-            print(f"🚨 Error: Configuration file '{CONFIG_FILE}' not found.")
-            return None
-        try:
-            config = configparser.ConfigParser()
-            config.read(CONFIG_FILE)
-            # Basic validation
-            if 'SQLServer' not in config or 'MongoDB' not in config:
-                print("🚨 Error: Config file must contain [SQLServer] and [MongoDB] sections.")
-                return None
-            if not all(k in config['SQLServer'] for k in ['server', 'database', 'query']):
-                 print("🚨 Error: [SQLServer] section missing server, database, or query.")
-                 return None
-            if not all(k in config['MongoDB'] for k in ['uri', 'database', 'collection']):
-                 print("🚨 Error: [MongoDB] section missing uri, database, or collection.")
-                 return None
-            print("✅ Configuration loaded successfully.")
-            return config
-        except configparser.Error as e:
-            print(f"🚨 Error reading configuration file: {e}")
-            return None
+    def _get_sql_token(self):
+        """
+        Returns an Azure AD access token for Azure SQL, reusing the cached one
+        until it is close to expiry. Falls back to the Device Code Flow only
+        when no Azure CLI login, environment credential or cached token is available.
+        """
+        if self._sql_token and self._sql_token.expires_on - time.time() > TOKEN_REFRESH_MARGIN:
+            return self._sql_token
+
+        # --- Get Token (silent sources first, then Device Code Flow) ---
+        # If the Device Code Flow is reached it prints login instructions to the console
+        # and blocks until authentication completes or fails.
+        log.info("Requesting Azure AD token (Azure CLI / environment / device code)...")
+        self._sql_token = self._credential.get_token(SQL_RESOURCE_URI)
+        log.info(f"Successfully obtained Azure AD token (expires {self._sql_token.expires_on}).")
+        return self._sql_token
 
     def _get_sql_connection(self):
         """
-        Establishes a connection to SQL Server using Azure AD credentials
-        obtained via Device Code Flow (interactive console login).
+        Returns a connection to SQL Server using Azure AD credentials
+        (Azure CLI, environment, or Device Code Flow as an interactive fallback).
+        The connection is kept on the handler and reused while it is alive.
         """
-        if not self.config: return None
-
-        server = self.config['SQLServer']['server']
-        database = self.config['SQLServer']['database']
+        if self._sql_conn is not None:
+            try:
+                self._sql_conn.cursor().execute("SELECT 1").fetchone()
+                return self._sql_conn
+            except pyodbc.Error:
+                log.info("ℹ️ Cached SQL connection is no longer usable. Reconnecting...")
+                self.close_sql_connection()
+
+        server = self.cfg.sql_server
+        database = self.cfg.sql_database
         driver = '{ODBC Driver 17 for SQL Server}'
 
         conn_str = (
@@ -68,306 +206,587 @@ class DatabaseHandler:
             f"Server={server};"
             f"Database={database};"
         )
-        print(f"Attempting SQL connection to {server}/{database} using Azure AD Device Code Flow...")
+        log.info(f"Attempting SQL connection to {server}/{database} using Azure AD authentication...")
 
         try:
-            # --- Get Token using Device Code Flow ---
-            # This will print instructions to the console for interactive login
-            print("\nInitiating Azure AD Device Code Login...")
-            print("Please follow the instructions printed below in your console:")
-            credential = DeviceCodeCredential()
-
-            # The resource URI for Azure SQL Database
-            sql_resource_uri = "https://database.windows.net/.default"
-
-            # Calling get_token() with DeviceCodeCredential triggers the interactive flow
-            # if authentication is required. It will block until authentication completes or fails.
-            token_object = credential.get_token(sql_resource_uri)
-            print(f"\nSuccessfully obtained Azure AD token via Device Code Flow (expires {token_object.expires_on}).")
+            token_object = self._get_sql_token()
+        except Exception as credential_error:
+             # Catch errors from the credential chain or get_token()
+             log.error(f"🚨 Failed to obtain Azure AD token: {credential_error}")
+             log.error("  Log in with 'az login', or ensure device code flow is permitted in your environment.")
+             return None
 
+        try:
             token_bytes = token_object.token.encode("utf-16le")
             token_struct = struct.pack(f"<I{len(token_bytes)}s", len(token_bytes), token_bytes)
-            attrs_before = {1256: token_struct}
+            # The packet size has no ODBC connection-string keyword, so it is set as an attribute
+            attrs_before = {SQL_COPT_SS_ACCESS_TOKEN: token_struct, SQL_ATTR_PACKET_SIZE: SQL_PACKET_SIZE}
 
             # Connect using the token
-            conn = pyodbc.connect(conn_str, attrs_before=attrs_before, autocommit=True)
+            self._sql_conn = pyodbc.connect(conn_str, attrs_before=attrs_before, autocommit=True)
 
-            print("✅ SQL Server connection successful using Azure AD token.")
-            return conn
+            log.info("✅ SQL Server connection successful using Azure AD token.")
+            return self._sql_conn
 
-        except Exception as credential_error:
-             # Catch errors from DeviceCodeCredential or get_token()
-             print(f"\n🚨 Failed to obtain Azure AD token via Device Code Flow: {credential_error}")
-             print("  Ensure network connectivity and that device code flow is permitted in your environment.")
-             return None
         except pyodbc.Error as ex:
             sqlstate = ex.args[0]
-            print(f"🚨 SQL Server Connection Error: SQLSTATE {sqlstate} - {ex}")
+            log.error(f"🚨 SQL Server Connection Error: SQLSTATE {sqlstate} - {ex}")
             if 'Login failed for user' in str(ex):
-                 print("  Checklist: ")
-                 print("  1. Does your Azure AD user account have login permissions on the Azure SQL Server?")
-                 print("  2. Has your Azure AD user been added as a user to the specific database ('{database}')?")
-                 print("  3. Does the database user have appropriate permissions (e.g., db_datareader)?")
+                 log.error("  Checklist: ")
+                 log.error("  1. Does your Azure AD user account have login permissions on the Azure SQL Server?")
+                 log.error(f"  2. Has your Azure AD user been added as a user to the specific database ('{database}')?")
+                 log.error("  3. Does the database user have appropriate permissions (e.g., db_datareader)?")
             return None
         except Exception as e:
-             print(f"🚨 Unexpected error connecting to SQL Server: {e}")
+             log.error(f"🚨 Unexpected error connecting to SQL Server: {e}")
              return None
 
-    def fetch_game_details_from_sql(self):
+    def close_sql_connection(self):
+        """Closes the cached SQL connection, if any."""
+        if self._sql_conn is not None:
+            try:
+                self._sql_conn.close()
+                log.info("SQL connection closed.")
+            except pyodbc.Error:
+                pass # Already dropped by the server
+            self._sql_conn = None
+
+    def close_mongo_client(self):
+        """Closes the cached MongoClient (its connection pool and monitor threads), if any."""
+        if self._mongo_client is not None:
+            self._mongo_client.close()
+            log.info("MongoDB client closed.")
+            self._mongo_client = None
+
+    def iter_game_details_from_sql(self):
         """
-        Fetches game details from SQL Server based on the query in config.
-        Returns a list of dictionaries containing all fetched columns.
+        Runs the query from config against SQL Server and yields the result in
+        batches (lists of namedtuples with one field per fetched column), so
+        callers can start working before the whole result set has arrived.
+        Raises RuntimeError if the connection or query fails.
         """
-        if not self.config: return None
-
-        sql_query = self.config['SQLServer']['query']
-        print(f"Executing SQL query: {sql_query[:100]}...") # Log start of query
+        sql_query = self.cfg.sql_query
+        log.info(f"Executing SQL query: {sql_query[:100]}...") # Log start of query
 
         conn = self._get_sql_connection()
         if not conn:
-            return None
+            raise RuntimeError("Could not connect to SQL Server.")
 
-        game_details_list = []
+        total_fetched = 0
+        cursor = None
         try:
             cursor = conn.cursor()
+            cursor.arraysize = SQL_FETCH_BATCH_SIZE
             cursor.execute(sql_query)
             # Get column names from cursor description
             columns = [column[0] for column in cursor.description]
-            print(f"Fetched columns from SQL: {columns}") # Log fetched columns
+            log.info(f"Fetched columns from SQL: {columns}") # Log fetched columns
 
             # Ensure TitleName is present, as it's needed for scraping
             required_for_scraping = 'TitleName'
             if required_for_scraping not in columns:
-                 print(f"🚨 Error: SQL query result is missing required column for scraping: '{required_for_scraping}'. Check config.ini query.")
-                 return None
-
-            rows = cursor.fetchall()
-            for row in rows:
-                # Create a dictionary for each row using column names as keys
-                game_details = dict(zip(columns, row))
-                game_details_list.append(game_details)
-
-            print(f"✅ Fetched {len(game_details_list)} records from SQL Server.")
+                 log.error(f"🚨 Error: SQL query result is missing required column for scraping: '{required_for_scraping}'. Check config.ini query.")
+                 raise RuntimeError(f"SQL query result is missing column '{required_for_scraping}'.")
+
+            # Row type is built once from the column names; rename=True turns columns that
+            # are not valid identifiers (e.g. 'Overall Status by Title') into positional names.
+            GameDetails = collections.namedtuple("GameDetails", columns, rename=True)
+
+            # Stream the result set in batches instead of materializing it with fetchall()
+            while True:
+                rows = cursor.fetchmany(SQL_FETCH_BATCH_SIZE)
+                if not rows:
+                    break
+                total_fetched += len(rows)
+                yield [GameDetails(*row) for row in rows]
+
+            log.info(f"✅ Fetched {total_fetched} records from SQL Server.")
         except pyodbc.Error as ex:
-            print(f"🚨 SQL Query Error: {ex}")
-            return None
-        except Exception as e:
-             print(f"🚨 Unexpected error during SQL query execution: {e}")
-             return None
+            log.error(f"🚨 SQL Query Error: {ex}")
+            raise RuntimeError(f"SQL query failed: {ex}") from ex
         finally:
-            if conn:
-                conn.close()
-                print("SQL connection closed.")
+            # The connection itself stays open for the next run; only the cursor is released.
+            if cursor is not None:
+                cursor.close()
+
+    async def _wait_for_search_box(self, page):
+        """Waits for the grid and its filter input on a page. Returns the search box element."""
+        await page.wait_for_selector("div[role='grid']", timeout=30000)
+        return await page.wait_for_selector("input[placeholder='Type to filter']", timeout=30000)
+
+    @staticmethod
+    def _status_from_class(class_attr):
+        """Derives the SteamOS status from a grid row's class attribute."""
+        classes = (class_attr or "").split()
+        potential_status = classes[-1] if classes else ""
+        if potential_status.startswith("status-"):
+            return potential_status.replace("status-", "").capitalize()
+        if len(classes) > 1:
+            return classes[-1]
+        return "N/A"
+
+    async def _load_grid_lookup(self, page):
+        """
+        Scrolls the unfiltered grid from top to bottom once and returns a
+        {lowercased title: status} dict. Returns None if not every row of the
+        grid (per its aria-rowcount) could be read, so callers can fall back
+        to per-title searches instead of reporting missing titles as not found.
+        """
+        log.info("Reading the full game grid once for in-memory lookups...")
+        grid = await page.query_selector("div[role='grid']")
+        if not grid:
+            log.error("🚨 Grid container not found. Falling back to per-title searches.")
+            return None
 
-        return game_details_list
+        await grid.evaluate("g => { g.scrollTop = 0; }")
+        rows_by_index = {} # Every rendered row (header included) by aria-rowindex
+        stalled_scrolls = 0
+        while True:
+            new_rows = False
+            for row_index, web_title, class_attr in await page.evaluate(GRID_SNAPSHOT_JS, self.web_title_cell_index):
+                if int(row_index) not in rows_by_index:
+                    rows_by_index[int(row_index)] = (web_title, class_attr)
+                    new_rows = True
+            stalled_scrolls = 0 if new_rows else stalled_scrolls + 1
+            if stalled_scrolls > 3:
+                log.warning(f"⚠️ Grid stopped producing rows after {len(rows_by_index)} entries. Falling back to per-title searches.")
+                return None
+            at_bottom = await grid.evaluate(
+                "g => { const end = g.scrollTop + g.clientHeight >= g.scrollHeight - 1; g.scrollBy(0, g.clientHeight); return end; }"
+            )
+            if at_bottom:
+                # Only trust the snapshot once it holds every row the grid reports
+                expected_rows = await grid.evaluate(GRID_ROW_COUNT_JS) or max(rows_by_index, default=0)
+                if len(rows_by_index) >= expected_rows:
+                    break
+                log.info(f"Reached the end of the grid with {len(rows_by_index)}/{expected_rows} rows read. Waiting for the rest to render...")
+            await page.wait_for_timeout(self.grid_scroll_wait)
+
+        lookup = {}
+        for web_title, class_attr in rows_by_index.values():
+            if web_title:
+                lookup.setdefault(web_title.lower(), self._status_from_class(class_attr))
+        log.info(f"✅ Loaded {len(lookup)} titles from the grid.")
+        return lookup
 
     async def _get_steamos_result(self, page, search_box, title_name):
         """
         Searches checkmydeck for the title and returns the SteamOS status
         for an exact (case-insensitive) match. Returns status string or None.
         """
-        print(f"  -> Scraping for: '{title_name}'")
+        log.debug("  -> Scraping for: '%s'", title_name)
         found_status = None
         if not title_name: # Handle empty title names
-             print("  ⚠️ Skipping scrape due to empty title name.")
+             log.warning("  ⚠️ Skipping scrape due to empty title name.")
              return "Skipped (Empty)"
         try:
             await search_box.fill("")
             await search_box.fill(title_name)
-            await page.wait_for_timeout(self.search_wait)
+            try:
+                # Returns as soon as the filtered grid shows the title; only a miss waits the full timeout
+                await page.wait_for_function(
+                    SEARCH_MATCH_JS,
+                    arg=[title_name, self.web_title_cell_index],
+                    timeout=self.search_wait
+                )
+            except PlaywrightTimeoutError:
+                pass # No matching row appeared; the scan below reports "not found"
 
-            grid_selector = "div[role='grid']"
-            rows = await page.query_selector_all(f"{grid_selector} div[role='row']")
+            # Read the whole filtered grid in a single round-trip and match in Python
+            grid_rows = await page.evaluate(GRID_SNAPSHOT_JS, self.web_title_cell_index)
 
-            if not rows:
-                print(f"  ❌ No rows found in grid after searching.")
+            if not grid_rows:
+                log.debug("  ❌ No rows found in grid after searching.")
                 return None # Indicate not found
 
-            for row in rows:
-                cells = await row.query_selector_all("div[role='gridcell']")
-                if len(cells) > self.web_title_cell_index:
-                    try:
-                        web_title = (await cells[self.web_title_cell_index].inner_text()).strip()
-                        if web_title.lower() == title_name.lower():
-                            print(f"  ✅ Found exact match: '{web_title}'")
-                            status = "N/A"
-                            try:
-                                class_attr = await row.get_attribute("class") or ""
-                                classes = class_attr.split()
-                                potential_status = classes[-1] if classes else ""
-                                if potential_status.startswith("status-"):
-                                     status = potential_status.replace("status-", "").capitalize()
-                                elif len(classes) > 1:
-                                    status = classes[-1]
-                            except Exception as class_error:
-                                print(f"  ⚠️ Error extracting status: {class_error}")
-                            found_status = status
-                            break # Stop after finding exact match
-                    except Exception as cell_error:
-                        print(f"  ⚠️ Error reading cell: {cell_error}")
-                        continue
+            target_lower = title_name.lower()
+            for _, web_title, class_attr in grid_rows:
+                if web_title.lower() == target_lower:
+                    log.debug("  ✅ Found exact match: '%s'", web_title)
+                    found_status = self._status_from_class(class_attr)
+                    break # Stop after finding exact match
             if found_status is None:
-                print(f"  ❌ No exact match found in filtered results.")
+                log.debug("  ❌ No exact match found in filtered results.")
             return found_status # Will be None if no exact match found
 
         except Exception as e:
-            print(f"  🚨 An error occurred during scraping for '{title_name}': {e}")
+            log.error(f"  🚨 An error occurred during scraping for '{title_name}': {e}")
             return None # Indicate error/not found
 
+    def _get_mongo_client(self):
+        """
+        Returns the handler's MongoClient, creating it on first use. The client is
+        a connection pool, so it is kept open and reused for every write. The
+        unique index on MONGO_KEY_FIELDS is ensured on first use as well.
+        """
+        if self._mongo_client is None:
+            self._mongo_client = pymongo.MongoClient(
+                self.cfg.mongo_uri,
+                maxPoolSize=50,
+                minPoolSize=5,
+                retryWrites=True,
+                w="majority",
+                compressors="zlib", # Built into Python; zstd/snappy would need extra packages
+            )
+        if not self._mongo_index_ready:
+            # Upserts are keyed on MONGO_KEY_FIELDS so each one is an index lookup
+            # rather than a collection scan on every field of the document.
+            collection = self._mongo_client[self.cfg.mongo_db][self.cfg.mongo_collection]
+            try:
+                # The old (TitleID, SteamOSResult) unique index would reject rows differing only in ProductID
+                if LEGACY_MONGO_INDEX in collection.index_information():
+                    collection.drop_index(LEGACY_MONGO_INDEX)
+                    log.info(f"Dropped legacy MongoDB index '{LEGACY_MONGO_INDEX}'.")
+                collection.create_index(MONGO_KEY_FIELDS, unique=True, background=True)
+            except pymongo.errors.OperationFailure as e:
+                # e.g. older runs left duplicate keys behind; upserts still work, just unindexed
+                log.warning(f"⚠️ Could not create unique index on {[field for field, _ in MONGO_KEY_FIELDS]}: {e}")
+            self._mongo_index_ready = True # A connection error above skips this, so the next write retries
+        return self._mongo_client
+
     def write_results_to_mongo(self, results_list):
         """
-        Writes the list of result dictionaries to MongoDB, avoiding exact duplicates
-        using upsert operations.
+        Writes the list of result dictionaries to MongoDB, upserting on the
+        (TitleID, SteamOSResult) key so reruns update rather than duplicate.
         """
-        if not self.config: return False
         if not results_list:
-            print("ℹ️ No results provided to write to MongoDB.")
+            log.info("ℹ️ No results provided to write to MongoDB.")
             return True
 
-        mongo_uri = self.config['MongoDB']['uri']
-        mongo_db_name = self.config['MongoDB']['database']
-        mongo_collection_name = self.config['MongoDB']['collection']
+        mongo_db_name = self.cfg.mongo_db
+        mongo_collection_name = self.cfg.mongo_collection
 
-        print(f"\nAttempting MongoDB connection to {mongo_db_name}/{mongo_collection_name}...")
+        log.info(f"Writing to MongoDB {mongo_db_name}/{mongo_collection_name}...")
 
-        client = None # Initialize client to None
         try:
-            client = pymongo.MongoClient(mongo_uri)
-            client.admin.command('ismaster') # Verify connection
-            print("✅ MongoDB connection successful.")
-
+            # Connection problems surface from the first real operation below
+            client = self._get_mongo_client()
             db = client[mongo_db_name]
             collection = db[mongo_collection_name]
 
             # --- Upsert Logic ---
-            print(f"Processing {len(results_list)} documents for upsert into MongoDB...")
+            log.info(f"Processing {len(results_list)} documents for upsert into MongoDB...")
             upserted_count = 0
             matched_count = 0
 
-            # Option 1: Individual Upserts (Simpler to understand)
-            for doc in results_list:
-                # The filter matches *all* fields in the document to check for an exact duplicate
-                query_filter = doc.copy() # Use a copy to avoid modifying the original dict if needed
-
-                # Perform an upsert: update if found (based on filter), insert if not found.
-                # Using $setOnInsert ensures we only write the data during insertion.
-                # If a document with these exact values exists, matched_count increases.
-                # If no exact match exists, upserted_count increases.
-                result = collection.update_one(
-                    filter=query_filter,
-                    update={"$setOnInsert": doc},
+            operations = [
+                UpdateOne(
+                    filter={field: doc.get(field) for field, _ in MONGO_KEY_FIELDS},
+                    update={"$set": doc},
                     upsert=True
                 )
-                if result.upserted_id:
-                    upserted_count += 1
-                elif result.matched_count > 0:
-                    matched_count += 1
-
-            print(f"✅ MongoDB upsert complete. Inserted: {upserted_count}, Matched existing: {matched_count}.")
+                for doc in results_list
+            ]
+            # Send the upserts in batches rather than one round-trip per document.
+            # ordered=False lets the server keep going past individual failures.
+            for batch_start in range(0, len(operations), MONGO_BATCH_SIZE):
+                batch = operations[batch_start:batch_start + MONGO_BATCH_SIZE]
+                result = collection.bulk_write(batch, ordered=False)
+                upserted_count += result.upserted_count
+                matched_count += result.matched_count
+
+            log.info(f"✅ MongoDB upsert complete. Inserted: {upserted_count}, Matched existing: {matched_count}.")
             return True
 
+        except pymongo.errors.BulkWriteError as e:
+            log.error(f"🚨 MongoDB Bulk Write Error: {e.details.get('writeErrors', e)}")
+            return False
         except pymongo.errors.ConnectionFailure as e:
-            print(f"🚨 MongoDB Connection Error: {e}")
+            log.error(f"🚨 MongoDB Connection Error: {e}")
             return False
         except pymongo.errors.OperationFailure as e:
-             print(f"🚨 MongoDB Operation Error: {e}")
+             log.error(f"🚨 MongoDB Operation Error: {e}")
              return False
         except Exception as e:
-            print(f"🚨 Unexpected error interacting with MongoDB: {e}")
+            log.error(f"🚨 Unexpected error interacting with MongoDB: {e}")
             return False
+
+    @staticmethod
+    async def _block_heavy_resources(route):
+        """Aborts requests the scraper never looks at (images, fonts, media)."""
+        if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _save_login_state(self, p, url):
+        """
+        Opens a visible browser once so the user can log in / pass any checks,
+        then saves the session to AUTH_STATE_FILE and the browser's user agent to
+        AUTH_USER_AGENT_FILE for the headless scrape contexts.
+        """
+        login_browser = await p.chromium.launch(headless=False)
+        try:
+            login_context = await login_browser.new_context()
+            login_page = await login_context.new_page()
+            await login_page.goto(url, timeout=60000)
+            log.info(f"🚀 Browser opened. Please log in if required. Waiting {self.login_wait / 1000}s...")
+            await login_page.wait_for_timeout(self.login_wait)
+            await login_context.storage_state(path=AUTH_STATE_FILE)
+            # Headless Chromium reports a different user agent, which the site may tie the session to
+            user_agent = await login_page.evaluate("() => navigator.userAgent")
+            with open(AUTH_USER_AGENT_FILE, 'w', encoding='utf-8') as f:
+                f.write(user_agent)
+            log.info(f"💾 Login state saved to '{AUTH_STATE_FILE}'.")
         finally:
-            if client: # Check if client was successfully created before closing
-                client.close()
-                print("MongoDB connection closed.")
+            await login_browser.close()
+
+    async def _make_context(self, browser, url, contexts, user_agent):
+        """
+        Opens a new context + page on the grid with the saved session and the user agent
+        it was created with, and waits for the search box.
+        Returns (context, page, search_box); the context is also appended to `contexts`.
+        """
+        context = await browser.new_context(storage_state=AUTH_STATE_FILE, user_agent=user_agent)
+        contexts.append(context)
+        await context.route("**/*", self._block_heavy_resources)
+        page = await context.new_page()
+        await page.goto(url, timeout=60000)
+        search_box = await self._wait_for_search_box(page)
+        return context, page, search_box
+
+    async def _open_scrape_contexts(self, browser, url, contexts):
+        """
+        Opens scrape_concurrency contexts with the saved session and puts the ready
+        ones into a fresh self._context_pool. Returns the list of ready entries.
+        """
+        with open(AUTH_USER_AGENT_FILE, encoding='utf-8') as f:
+            user_agent = f.read().strip() or None # None keeps Playwright's default
+        self._context_pool = asyncio.Queue()
+        opened = await asyncio.gather(
+            *[self._make_context(browser, url, contexts, user_agent) for _ in range(self.scrape_concurrency)],
+            return_exceptions=True
+        )
+        ready = [entry for entry in opened if not isinstance(entry, Exception) and entry[2]]
+        for entry in opened:
+            if isinstance(entry, Exception):
+                log.warning(f"⚠️ Could not open a scraping context: {entry}")
+        for entry in ready:
+            self._context_pool.put_nowait(entry)
+        return ready
+
+    async def _init_browser(self, p, contexts):
+        """
+        Launches headless Chromium and fills self._context_pool with scrape_concurrency
+        ready (context, page, search_box) entries. Opened contexts are appended
+        to `contexts` so the caller can close them.
+        Returns (browser, first_page), or None if initialization failed.
+        """
+        log.info("Initializing browser for scraping...")
+        url = "https://checkmydeck.ofdgn.com/all-games?sort=deck-compat-last-change-desc"
+        try:
+            # Manual login only happens in a visible browser when no saved session exists
+            saved_session = os.path.exists(AUTH_STATE_FILE) and os.path.exists(AUTH_USER_AGENT_FILE)
+            if not saved_session:
+                await self._save_login_state(p, url)
+
+            browser = await p.chromium.launch(headless=True, args=["--disable-blink-features=AutomationControlled"])
+            ready = await self._open_scrape_contexts(browser, url, contexts)
+            if not ready and saved_session:
+                # The saved session (or its Cloudflare clearance) has most likely expired: log in again once
+                log.warning("⚠️ No scraping context reached the grid with the saved login. Opening the login browser again...")
+                for context in contexts:
+                    try:
+                        await context.close()
+                    except Exception:
+                        pass # Browser may already be gone
+                contexts.clear()
+                await self._save_login_state(p, url)
+                ready = await self._open_scrape_contexts(browser, url, contexts)
+
+            if not ready:
+                log.error("🚨 Could not find search box element on page.")
+                return None
+            log.info(f"✅ Browser ready for scraping with {len(ready)} parallel contexts.")
+            return browser, ready[0][1]
+        except Exception as e:
+            log.error(f"🚨 Browser initialization/navigation failed: {e}")
+            return None
 
     async def run_db_process(self):
         """
         Orchestrates fetching from SQL, scraping SteamOS status,
         and writing specified results to MongoDB. (Async)
-        """
-        print("\n--- Starting Database Fetch, Scrape, and Store Process ---")
-        fetched_game_details = self.fetch_game_details_from_sql() # Contains all SQL columns
-        if fetched_game_details is None:
-            print("🚨 Failed to fetch details from SQL Server. Aborting.")
-            return False
-
-        if not fetched_game_details:
-             print("ℹ️ No game details fetched from SQL Server. Nothing to process.")
-             return True
 
-        # --- Initialize Playwright ---
-        print("\nInitializing browser for scraping...")
+        The three stages run as a pipeline connected by asyncio queues: rows are
+        scraped as soon as they arrive from SQL, and scraped documents are
+        written to MongoDB in batches while scraping continues.
+        """
+        log.info("--- Starting Database Fetch, Scrape, and Store Process ---")
         browser = None # Initialize browser variable
+        contexts = [] # All contexts opened for scraping, closed in finally
+        worker_count = self.scrape_concurrency
+        row_queue = asyncio.Queue() # SQL rows waiting to be scraped; None marks the end
+        doc_queue = asyncio.Queue() # Finished MongoDB documents; None marks the end
+        counts = {'fetched': 0, 'written': 0, 'scraped': 0} # SQL rows, stored documents, distinct titles searched
+        failures = []
+        # Set once enough titles have arrived to pick the grid snapshot, or when SQL is done
+        snapshot_decidable = asyncio.Event()
+        producer = None
+
+        async def produce_rows():
+            """Pulls SQL batches on a worker thread and feeds rows to the scrapers."""
+            batches = self.iter_game_details_from_sql()
+            next_batch = None
+            try:
+                while True:
+                    # next() blocks on pyodbc, so it runs off the event loop; shielded so a
+                    # cancelled run still lets the in-flight fetch finish before the generator is closed
+                    next_batch = asyncio.ensure_future(asyncio.to_thread(next, batches, None))
+                    batch = await asyncio.shield(next_batch)
+                    if batch is None:
+                        break
+                    counts['fetched'] += len(batch)
+                    if counts['fetched'] >= self.grid_snapshot_min_titles:
+                        snapshot_decidable.set()
+                    for game_data in batch:
+                        row_queue.put_nowait(game_data)
+            except Exception as e:
+                log.error(f"🚨 Failed to fetch details from SQL Server: {e}")
+                failures.append("sql")
+            finally:
+                if next_batch is not None and not next_batch.done():
+                    await asyncio.wait([next_batch])
+                # Runs the generator's cleanup, which closes the SQL cursor
+                await asyncio.to_thread(batches.close)
+                snapshot_decidable.set()
+                for _ in range(worker_count):
+                    row_queue.put_nowait(None)
+
+        async def write_docs():
+            """Collects scraped documents and upserts them in batches."""
+            pending = []
+            last_flush = time.monotonic()
+
+            async def flush():
+                nonlocal last_flush
+                if pending:
+                    batch = pending.copy()
+                    pending.clear()
+                    if await asyncio.to_thread(self.write_results_to_mongo, batch):
+                        counts['written'] += len(batch)
+                    else:
+                        failures.append("mongo")
+                last_flush = time.monotonic()
+
+            while True:
+                try:
+                    doc = await asyncio.wait_for(doc_queue.get(), timeout=MONGO_FLUSH_SECONDS)
+                except asyncio.TimeoutError:
+                    await flush() # Nothing new for a while; write what we have
+                    continue
+                if doc is None:
+                    break
+                pending.append(doc)
+                if len(pending) >= MONGO_FLUSH_DOCS or time.monotonic() - last_flush >= MONGO_FLUSH_SECONDS:
+                    await flush()
+            await flush()
+
         try:
             async with async_playwright() as p:
-                browser = await p.chromium.launch(headless=False) # Or True if preferred
-                context = await browser.new_context()
-                page = await context.new_page()
-                url = "https://checkmydeck.ofdgn.com/all-games?sort=deck-compat-last-change-desc"
-                search_box_element = None
-                try:
-                    await page.goto(url, timeout=60000)
-                    print(f"🚀 Browser opened. Please log in if required. Waiting {self.login_wait / 1000}s...")
-                    await page.wait_for_timeout(self.login_wait)
-                    search_input_selector = "input[placeholder='Type to filter']"
-                    await page.wait_for_selector("div[role='grid']", timeout=30000)
-                    search_box_element = await page.wait_for_selector(search_input_selector, timeout=30000)
-                    print("✅ Browser ready for scraping.")
-                except Exception as e:
-                    print(f"🚨 Browser initialization/navigation failed: {e}")
-                    return False # Cannot proceed without browser
-
-                if not search_box_element:
-                     print("🚨 Could not find search box element on page.")
-                     return False
-
-                # --- Scrape status and prepare final documents ---
-                print(f"\nScraping SteamOS status for {len(fetched_game_details)} titles...")
-                results_for_mongo = []
-                required_mongo_fields = ['TitleName', 'TitleID', 'PublisherName', 'ProductID', 'PublisherType']
-
-                for index, game_data in enumerate(fetched_game_details):
-                    title_to_scrape = game_data.get('TitleName', '').strip()
-                    print(f"Processing {index + 1}/{len(fetched_game_details)}: '{title_to_scrape}'")
-
-                    status = await self._get_steamos_result(page, search_box_element, title_to_scrape)
-                    scraped_status = status if status is not None else "Not Found"
-
-                    # --- Construct the final document for MongoDB ---
-                    final_doc = {}
-                    all_keys_present = True
-                    for key in required_mongo_fields:
-                        if key in game_data:
-                            final_doc[key] = game_data[key]
+                # SQL rows start streaming while the browser starts up and waits for login
+                producer = asyncio.create_task(produce_rows())
+                browser_setup = await self._init_browser(p, contexts)
+                if browser_setup is None:
+                    return False # Cannot proceed without browser; the producer is stopped below
+                browser, page = browser_setup
+
+                # For large batches one pass over the whole grid beats one search per title.
+                # Decided once grid_snapshot_min_titles rows have arrived or SQL has finished.
+                await snapshot_decidable.wait()
+                grid_lookup = None
+                if counts['fetched'] >= self.grid_snapshot_min_titles:
+                    try:
+                        grid_lookup = await self._load_grid_lookup(page)
+                    except Exception as e:
+                        log.warning(f"⚠️ Reading the full grid failed ({e}). Falling back to per-title searches.")
+
+                log.info("Scraping SteamOS status as titles arrive from SQL...")
+                writer = asyncio.create_task(write_docs())
+
+                # One scrape task per distinct (lowercased) title; duplicate SQL rows await the same task
+                scrape_tasks = {}
+                # Field projection per row type, chosen once (rows share the same columns)
+                projectors = {}
+
+                async def scrape_title(title_to_scrape):
+                    """Searches one title on a free pooled page."""
+                    pooled = await self._context_pool.get()
+                    _, worker_page, worker_search_box = pooled
+                    try:
+                        return await self._get_steamos_result(worker_page, worker_search_box, title_to_scrape)
+                    finally:
+                        self._context_pool.put_nowait(pooled)
+                        counts['scraped'] += 1
+
+                def projector_for(game_data):
+                    """Returns the function extracting REQUIRED_MONGO_FIELDS from rows like game_data."""
+                    row_type = type(game_data)
+                    if row_type not in projectors:
+                        missing_fields = [key for key in self.REQUIRED_MONGO_FIELDS if key not in row_type._fields]
+                        if missing_fields:
+                            log.warning(f"⚠️ Warning: Keys {missing_fields} not found in fetched data. They will be set to None.")
+                            projectors[row_type] = lambda row: tuple(getattr(row, key, None) for key in self.REQUIRED_MONGO_FIELDS)
                         else:
-                            print(f"⚠️ Warning: Key '{key}' not found in fetched data for title '{title_to_scrape}'. Setting to None.")
-                            final_doc[key] = None
-                            all_keys_present = False
-
-                    final_doc['SteamOSResult'] = scraped_status
+                            projectors[row_type] = self._get_mongo_fields # C-level extraction of all fields at once
+                    return projectors[row_type]
+
+                async def scrape_worker():
+                    """Resolves each queued row's status and emits its MongoDB document."""
+                    while True:
+                        game_data = await row_queue.get()
+                        if game_data is None:
+                            break
+                        title_to_scrape = (getattr(game_data, 'TitleName', '') or '').strip()
+                        title_key = title_to_scrape.lower()
+                        if grid_lookup is not None:
+                            status = grid_lookup.get(title_key) if title_to_scrape else "Skipped (Empty)"
+                        else:
+                            if title_key not in scrape_tasks:
+                                log.info(f"Queued title {len(scrape_tasks) + 1} ({counts['scraped']} scraped so far): '{title_to_scrape}'")
+                                scrape_tasks[title_key] = asyncio.ensure_future(scrape_title(title_to_scrape))
+                            status = await scrape_tasks[title_key]
+                        scraped_status = status if status is not None else "Not Found"
 
-                    if not all_keys_present:
-                         print(f"  -> Document for '{title_to_scrape}' has missing fields.")
+                        # --- Construct the final document for MongoDB ---
+                        final_doc = dict(zip(self.REQUIRED_MONGO_FIELDS, projector_for(game_data)(game_data)))
+                        final_doc['SteamOSResult'] = scraped_status
+                        doc_queue.put_nowait(final_doc)
 
-                    results_for_mongo.append(final_doc)
+                try:
+                    await asyncio.gather(*[scrape_worker() for _ in range(worker_count)])
+                    await producer
+                finally:
+                    doc_queue.put_nowait(None)
+                    await writer
 
         except Exception as e:
-             print(f"🚨 An unexpected error occurred during the Playwright/Scraping phase: {e}")
+             log.error(f"🚨 An unexpected error occurred during the Playwright/Scraping phase: {e}")
              return False
         finally:
+            if producer is not None and not producer.done():
+                producer.cancel()
+                await asyncio.gather(producer, return_exceptions=True) # Closes the SQL generator and cursor
+            for context in contexts:
+                try:
+                    await context.close()
+                except Exception:
+                    pass # Browser may already be gone
             if browser:
                 await browser.close()
-                print("\n🔒 Browser closed.")
+                log.info("🔒 Browser closed.")
 
-        if not results_for_mongo:
-             print("ℹ️ No results were prepared for MongoDB.")
-             success = False
+        if failures:
+            success = False
+        elif counts['fetched'] == 0:
+            log.info("ℹ️ No game details fetched from SQL Server. Nothing to process.")
+            success = True
         else:
-            # Call the updated write method
-            success = self.write_results_to_mongo(results_for_mongo)
+            log.info(f"✅ Stored {counts['written']} documents for {counts['fetched']} fetched titles.")
+            success = True
 
         if success:
-            print("\n--- Database Fetch, Scrape, and Store Process Completed Successfully ---")
+            log.info("--- Database Fetch, Scrape, and Store Process Completed Successfully ---")
         else:
-            print("\n🚨 Database Fetch, Scrape, and Store Process Failed ---")
+            log.error("🚨 Database Fetch, Scrape, and Store Process Failed ---")
         return success
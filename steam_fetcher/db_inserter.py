@@ -2,11 +2,37 @@ import pyodbc
 import pandas as pd
 import time
 import numpy as np
+import re
+import math
 import configparser # Added import
 import os # Added import
 
 # Define the default date
 DEFAULT_DATE = pd.Timestamp('1900-01-01')
+# Rows sent per executemany call when uploading to the staging table
+STAGE_CHUNK_SIZE = 2000
+# Rows merged per transaction; override with CommitBatchSize in [SteamFetcherDatabase]
+DEFAULT_COMMIT_BATCH_SIZE = 1000
+# CSV spellings accepted for SQL 'bit' columns; anything else becomes NULL
+BIT_TRUE_VALUES = ['true', '1', 'yes']
+BIT_FALSE_VALUES = ['false', '0', 'no']
+# CSV rows read, cleaned and merged per pass; keeps memory flat for large files
+CSV_CHUNK_SIZE = 50000
+# Whitespace-only text cells; common blanks are already NA-ified by read_csv via CSV_NA_VALUES
+BLANK_CELL_RE = re.compile(r'^\s*$')
+CSV_NA_VALUES = ['', ' ', '\t']
+# Length of the persisted lowercase key column (450 NVARCHAR chars is the index key limit)
+KEY_LOWER_LENGTH = 450
+# Text columns with fewer distinct values than this share of rows are stored as categoricals
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+# Minimum time between per-batch status/progress callbacks
+CALLBACK_INTERVAL_SECONDS = 0.1
+
+NUMERIC_SQL_TYPES = ['int', 'bigint', 'smallint', 'tinyint', 'decimal', 'numeric', 'float', 'real', 'money', 'smallmoney', 'bit']
+DATE_SQL_TYPES = ['date']
+DATETIME_SQL_TYPES = ['datetime', 'datetime2', 'smalldatetime']
+TIME_SQL_TYPES = ['time']
+TEMPORAL_SQL_TYPES = DATE_SQL_TYPES + DATETIME_SQL_TYPES + TIME_SQL_TYPES
 
 def get_db_config():
     """Reads database configuration from config.ini"""
@@ -29,11 +55,66 @@ def get_db_config():
             
     return db_config
 
+def clean_csv_chunk(df, db_columns_raw, db_type_by_lower):
+    """
+    Converts one CSV chunk (already renamed to the DB column names) to values the
+    target table accepts: numbers, bits and dates are coerced per SQL type, blanks
+    and unparsable values become missing, and missing dates become DEFAULT_DATE.
+    """
+    df_clean = pd.DataFrame(index=df.index)
+
+    for db_col_name in db_columns_raw:
+        db_type = db_type_by_lower.get(db_col_name.lower(), '')
+        series = df[db_col_name]
+
+        if any(num_type in db_type for num_type in NUMERIC_SQL_TYPES):
+            if db_type == 'bit':
+                lowered = series.astype(str).str.lower()
+                series = pd.Series(
+                    np.select([lowered.isin(BIT_TRUE_VALUES), lowered.isin(BIT_FALSE_VALUES)], [1, 0], default=np.nan),
+                    index=series.index,
+                )
+            series = pd.to_numeric(series, errors='coerce')
+        elif any(d_type in db_type for d_type in TEMPORAL_SQL_TYPES):
+            if pd.api.types.is_numeric_dtype(series):
+                series = pd.to_datetime(series, errors='coerce', unit='s') # Epoch seconds
+            else:
+                # cache=True parses each distinct date string once
+                series = pd.to_datetime(series, errors='coerce', dayfirst=True, cache=True)
+            series.fillna(DEFAULT_DATE, inplace=True) # Fill NaT/None with default Timestamp
+        elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            # String types (object or StringDtype): whitespace-only cells become missing (typed columns coerce them above)
+            series = series.mask(series.str.match(BLANK_CELL_RE, na=False))
+
+        df_clean[db_col_name] = series
+
+    return optimize_dtypes(df_clean)
+
+def optimize_dtypes(df):
+    """
+    Shrinks a cleaned chunk in memory: whole-number columns are downcast to the
+    smallest integer type and repetitive text columns become categoricals.
+    Floats are left as float64, since float32 would change the stored values.
+    """
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            df[col] = pd.to_numeric(series, downcast='integer') # No-op for fractional or NaN columns
+        elif series.dtype == object and len(series) and series.nunique() / len(series) < CATEGORY_MAX_UNIQUE_RATIO:
+            df[col] = series.astype('category')
+    return df
+
+def to_db_params(rows):
+    """Returns the row tuples with NaN/NaT replaced by None, which pyodbc sends as NULL."""
+    return [tuple(None if value is pd.NaT or (isinstance(value, float) and math.isnan(value)) else value
+                  for value in row)
+            for row in rows]
+
 def insert_csv_to_db(csv_path, status_callback, progress_callback):
     """
     Connects to Azure SQL DB, validates CSV columns, handles missing/default values,
-    and processes each row individually: inserting new titles, updating if the CSV
-    row is newer, or skipping if the database row is newer or the same.
+    and merges the rows chunk by chunk on the server: inserting new titles, updating
+    if the CSV row is newer, or skipping if the database row is newer or the same.
 
     Args:
         csv_path (str): Path to the input CSV file.
@@ -50,7 +131,8 @@ def insert_csv_to_db(csv_path, status_callback, progress_callback):
         target_table_name = db_conf['TargetTable']
         key_column = db_conf['KeyColumn']
         date_column = db_conf['DateColumn']
-    except (FileNotFoundError, KeyError) as e:
+        commit_batch_size = max(1, db_conf.getint('CommitBatchSize', fallback=DEFAULT_COMMIT_BATCH_SIZE))
+    except (FileNotFoundError, KeyError, ValueError) as e:
         return False, str(e)
 
     rows_processed_total = 0
@@ -58,6 +140,7 @@ def insert_csv_to_db(csv_path, status_callback, progress_callback):
     rows_updated = 0
     rows_skipped_older = 0
     rows_skipped_empty_title = 0
+    rows_committed = 0 # Also reported if a later chunk fails
 
     conn_str = (
         f'Driver={{ODBC Driver 18 for SQL Server}};'
@@ -75,7 +158,7 @@ def insert_csv_to_db(csv_path, status_callback, progress_callback):
     try:
         status_callback(f"Connecting to Azure SQL: {server}/{database}...")
         conn = pyodbc.connect(conn_str)
-        # Set autocommit to False to manage transactions for delete+insert
+        # Set autocommit to False so each staged batch and its merge commit together
         conn.autocommit = False
         cursor = conn.cursor()
         status_callback("Connected to database.")
@@ -86,6 +169,7 @@ def insert_csv_to_db(csv_path, status_callback, progress_callback):
             SELECT COLUMN_NAME, DATA_TYPE
             FROM INFORMATION_SCHEMA.COLUMNS
             WHERE TABLE_SCHEMA = 'dbo' AND TABLE_NAME = ?
+              AND COLUMNPROPERTY(OBJECT_ID(QUOTENAME(TABLE_SCHEMA) + '.' + QUOTENAME(TABLE_NAME)), COLUMN_NAME, 'IsComputed') = 0
             ORDER BY ORDINAL_POSITION;
         """
         table_name_only = target_table_name.split('.')[-1].strip('[]')
@@ -96,14 +180,20 @@ def insert_csv_to_db(csv_path, status_callback, progress_callback):
 
         db_columns_raw = [row.COLUMN_NAME for row in db_schema_info]
         db_columns_lower = [col.lower() for col in db_columns_raw]
+        lower_to_idx = {col: i for i, col in enumerate(db_columns_lower)}
         status_callback(f"Target table columns: {', '.join(db_columns_raw)}")
 
-        # --- Read CSV File ---
+        typed_sql_types = NUMERIC_SQL_TYPES + TEMPORAL_SQL_TYPES
+        db_type_by_lower = {info.COLUMN_NAME.lower(): info.DATA_TYPE.lower() for info in db_schema_info}
+
+        # --- Read CSV Header ---
         status_callback(f"Reading CSV file: {csv_path}...")
         try:
-            df = pd.read_csv(csv_path, encoding='utf-8', keep_default_na=False, na_values=[''])
-            original_csv_rows = len(df)
-            status_callback(f"Read {original_csv_rows} rows from CSV.")
+            csv_header = pd.read_csv(csv_path, encoding='utf-8', nrows=0).columns
+            # Line count is only used to size the progress bar
+            with open(csv_path, 'rb') as csv_file:
+                total_csv_rows = max(sum(1 for _ in csv_file) - 1, 0)
+            status_callback(f"CSV has about {total_csv_rows} rows.")
         except FileNotFoundError:
              return False, f"Error: CSV file not found at {csv_path}"
         except UnicodeDecodeError:
@@ -111,7 +201,7 @@ def insert_csv_to_db(csv_path, status_callback, progress_callback):
         except Exception as e:
              return False, f"Error reading CSV file: {e}"
 
-        csv_columns_raw = df.columns.tolist()
+        csv_columns_raw = csv_header.tolist()
         csv_columns_lower = [col.lower() for col in csv_columns_raw]
         status_callback(f"CSV columns: {', '.join(csv_columns_raw)}")
 
@@ -165,135 +255,186 @@ def insert_csv_to_db(csv_path, status_callback, progress_callback):
             return False, "\n".join(error_lines)
 
         status_callback("Column validation successful.")
-        # --- Data Type Conversion and Cleaning ---
-        status_callback("Cleaning and converting data types...")
-        numeric_sql_types = ['int', 'bigint', 'smallint', 'tinyint', 'decimal', 'numeric', 'float', 'real', 'money', 'smallmoney', 'bit']
-        date_sql_types = ['date']
-        datetime_sql_types = ['datetime', 'datetime2', 'smalldatetime']
-        time_sql_types = ['time']
-
-        df_clean = pd.DataFrame()
-
-        for db_col_name in db_columns_raw:
-            csv_col_name = df.columns[db_columns_lower.index(db_col_name.lower())]
-            db_type_info = next((info for info in db_schema_info if info.COLUMN_NAME == db_col_name), None)
-            db_type = db_type_info.DATA_TYPE.lower() if db_type_info else ''
-            series = df[csv_col_name].copy()
-            series.replace(r'^\s*$', None, regex=True, inplace=True)
-
-            if any(num_type in db_type for num_type in numeric_sql_types):
-                if db_type == 'bit':
-                    bool_map = {'true': 1, 'false': 0, '1': 1, '0': 0, 'yes': 1, 'no': 0, '': None}
-                    series = series.astype(str).str.lower().map(bool_map).astype(float)
-                series = pd.to_numeric(series, errors='coerce')
-            elif any(d_type in db_type for d_type in date_sql_types + datetime_sql_types + time_sql_types):
-                series_dt = pd.to_datetime(series, errors='coerce', dayfirst=True)
-                series = series_dt.fillna(DEFAULT_DATE) # Fill NaT/None with default Timestamp
-            # else: # String types
-                pass
-
-            df_clean[db_col_name] = series
-
-        df_clean = df_clean.astype(object).where(pd.notnull(df_clean), None)
-        status_callback("Data cleaning finished.")
-
-        # --- Filter out rows with empty Title ---
-        initial_clean_rows = len(df_clean)
-        title_is_missing = df_clean[key_column].isnull() | (df_clean[key_column].astype(str).str.strip() == '')
-        df_clean = df_clean[~title_is_missing]
-        rows_skipped_empty_title = initial_clean_rows - len(df_clean)
-        if rows_skipped_empty_title > 0:
-            status_callback(f"Skipped {rows_skipped_empty_title} rows due to missing '{key_column}'.")
-
-        if df_clean.empty:
-             return True, f"No valid rows remaining after filtering for missing '{key_column}'. Processed {original_csv_rows} CSV rows."
-
-        rows_to_process = len(df_clean)
-        status_callback(f"Processing {rows_to_process} valid rows individually...")
-        progress_callback(0, rows_to_process)
+        # Config names may differ in case from the table; use the table's spelling from here on
+        key_column = db_columns_raw[lower_to_idx[key_column.lower()]]
+        date_column = db_columns_raw[lower_to_idx[date_column.lower()]]
+
+        # --- Ensure Indexed Lowercase Key Column ---
+        # LOWER(CAST(...)) on the key can't use an index; a persisted lowercase copy can.
+        # Computed columns are excluded from the schema above, so the CSV never has to supply it.
+        key_lower_column = f"{key_column}Lower"
+        cursor.execute("SELECT COL_LENGTH(?, ?)", target_table_name, key_lower_column)
+        has_key_lower = cursor.fetchone()[0] is not None
+        if not has_key_lower:
+            try:
+                status_callback(f"Adding indexed column '{key_lower_column}' to {target_table_name}...")
+                cursor.execute(f"ALTER TABLE {target_table_name} ADD [{key_lower_column}] AS "
+                               f"LOWER(CAST([{key_column}] AS NVARCHAR({KEY_LOWER_LENGTH}))) PERSISTED")
+                cursor.execute(f"CREATE INDEX [IX_{table_name_only}_{key_lower_column}] ON {target_table_name} "
+                               f"([{key_lower_column}]) INCLUDE ([{date_column}])")
+                conn.commit()
+                has_key_lower = True
+            except pyodbc.Error as ex:
+                conn.rollback()
+                status_callback(f"Warning: Could not add '{key_lower_column}' ({ex}). Matching titles without an index.")
+
+        # --- Load Existing Rows ---
+        # One read of (title, date) for the whole table replaces a lookup query per CSV row
+        status_callback(f"Loading existing '{key_column}' dates from {target_table_name}...")
+        preload_key = key_lower_column if has_key_lower else key_column # Index covers (lowercase key, date)
+        cursor.execute(f"SELECT [{preload_key}], [{date_column}] FROM {target_table_name}")
+        existing_df = pd.DataFrame.from_records([tuple(row) for row in cursor.fetchall()], columns=['_k', '_d'])
+        existing_df = existing_df.dropna(subset=['_k'])
+        existing_df['_k'] = existing_df['_k'].astype(str).str.lower()
+        # Missing or invalid DB dates count as DEFAULT_DATE, so any real CSV date is newer
+        existing_df['_d'] = pd.to_datetime(existing_df['_d'], errors='coerce').fillna(DEFAULT_DATE)
+        # Case variants of one title in the table: compare against the newest one
+        existing_df = existing_df.groupby('_k', as_index=False)['_d'].max()
+        status_callback(f"Loaded {len(existing_df)} existing titles.")
 
         # --- Define SQL Statements ---
-        # *** ADD CAST to VARCHAR(MAX) for LOWER() compatibility with TEXT type ***
-        sql_select = f"SELECT [{date_column}] FROM {target_table_name} WHERE LOWER(CAST([{key_column}] AS VARCHAR(MAX))) = LOWER(?)"
-        sql_delete = f"DELETE FROM {target_table_name} WHERE LOWER(CAST([{key_column}] AS VARCHAR(MAX))) = LOWER(?)"
-        sql_insert = f"INSERT INTO {target_table_name} ({', '.join([f'[{c}]' for c in db_columns_raw])}) VALUES ({', '.join(['?'] * len(db_columns_raw))})"
-
-        # --- Process Rows Individually ---
-        for index, row in df_clean.iterrows():
-            rows_processed_total += 1
-            current_title = row[key_column]
-            current_date = row[date_column] # This is a Timestamp object
-            row_values = tuple(row[db_columns_raw]) # Ensure order matches db_columns_raw
-
+        if has_key_lower:
+            match_condition = f"t.[{key_lower_column}] = LOWER(CAST(s.[{key_column}] AS NVARCHAR({KEY_LOWER_LENGTH})))"
+        else:
+            # *** ADD CAST to VARCHAR(MAX) for LOWER() compatibility with TEXT type ***
+            match_condition = f"LOWER(CAST(t.[{key_column}] AS VARCHAR(MAX))) = LOWER(CAST(s.[{key_column}] AS VARCHAR(MAX)))"
+        column_list = ', '.join([f'[{c}]' for c in db_columns_raw])
+        # Empty copy of the target's columns (same types, no rows) to bulk load into
+        sql_create_stage = f"SELECT TOP 0 {column_list} INTO #stage FROM {target_table_name}"
+        sql_stage_insert = f"INSERT INTO #stage ({column_list}) VALUES ({', '.join(['?'] * len(db_columns_raw))})"
+        update_set = ', '.join([f't.[{c}] = s.[{c}]' for c in db_columns_raw if c != key_column])
+        sql_merge = f"""
+            SET NOCOUNT ON;
+            DECLARE @changes TABLE (MergeAction NVARCHAR(10));
+            MERGE {target_table_name} AS t
+            USING #stage AS s
+                ON {match_condition}
+            WHEN MATCHED AND s.[{date_column}] > ISNULL(t.[{date_column}], '{DEFAULT_DATE:%Y-%m-%d}') THEN
+                UPDATE SET {update_set}
+            WHEN NOT MATCHED BY TARGET THEN
+                INSERT ({column_list}) VALUES ({', '.join([f's.[{c}]' for c in db_columns_raw])})
+            OUTPUT $action INTO @changes;
+            SELECT
+                SUM(CASE WHEN MergeAction = 'INSERT' THEN 1 ELSE 0 END),
+                SUM(CASE WHEN MergeAction = 'UPDATE' THEN 1 ELSE 0 END)
+            FROM @changes;
+        """
+        cursor.execute(sql_create_stage)
+        cursor.fast_executemany = True # Send rows as parameter arrays, not one round trip each
+
+        # --- Process CSV in Chunks ---
+        # Text columns are read as str (no type guessing, e.g. a title like '1984' stays text)
+        read_dtypes = {col: str for col in csv_columns_raw
+                       if not any(t in db_type_by_lower.get(col.lower(), '') for t in typed_sql_types)}
+        text_columns_only = len(read_dtypes) == len(csv_columns_raw)
+        csv_chunks = pd.read_csv(csv_path, encoding='utf-8', keep_default_na=False, na_values=CSV_NA_VALUES,
+                                 dtype=read_dtypes, engine='c', chunksize=CSV_CHUNK_SIZE)
+        original_csv_rows = 0
+        last_callback_time = 0.0
+        progress_callback(0, total_csv_rows)
+
+        for df in csv_chunks:
+            chunk_first_row = original_csv_rows
+            original_csv_rows += len(df)
+            total_csv_rows = max(total_csv_rows, original_csv_rows) # Quoted newlines make the line count low
+
+            # --- Data Type Conversion and Cleaning ---
+            # Validation guarantees the same columns in the same order, so CSV headers take the DB names
+            df.columns = db_columns_raw
+            if text_columns_only:
+                # Nothing to coerce: only whitespace-only cells need to become missing
+                df_clean = df.replace(BLANK_CELL_RE, np.nan, regex=True)
+            else:
+                df_clean = clean_csv_chunk(df, db_columns_raw, db_type_by_lower)
+
+            # --- Filter out rows with empty Title ---
+            # Cleaning normally NA-ifies whitespace-only titles; the strip check keeps them out regardless of dtype
+            titles = df_clean[key_column].astype(str)
+            title_is_missing = (df_clean[key_column].isnull() | (titles.str.strip() == '')).to_numpy()
+            # Lowercased once; reused for dedupe, the snapshot merge and the snapshot update
+            title_keys = titles.str.lower()[~title_is_missing]
+            df_clean = df_clean[~title_is_missing]
+            rows_skipped_empty_title += int(title_is_missing.sum())
+            rows_processed_total += len(df_clean)
+
+            # Dates for the newest-row comparisons; a text DateColumn (e.g. the text-only fast path)
+            # is parsed here the same way clean_csv_chunk parses typed date columns
+            csv_dates = df_clean[date_column]
+            if not pd.api.types.is_datetime64_any_dtype(csv_dates):
+                csv_dates = pd.to_datetime(csv_dates, errors='coerce', dayfirst=True, cache=True).fillna(DEFAULT_DATE)
+
+            # --- Collapse duplicate titles within the chunk ---
+            # Processing rows one by one let the newest copy of a title win (earliest on ties);
+            # keep exactly that copy so each staged title matches at most one MERGE source row.
+            newest_first = csv_dates.sort_values(ascending=False, kind='stable').index
+            keep_index = title_keys.loc[newest_first].drop_duplicates().index
+            df_clean = df_clean.loc[df_clean.index.isin(keep_index)]
+            title_keys = title_keys.loc[df_clean.index]
+            csv_dates = csv_dates.loc[df_clean.index]
+
+            # --- Compare Against Existing Rows ---
+            # A left merge keeps the chunk's row order, so its columns line up with df_clean
+            matched = pd.merge(title_keys.rename('_k').to_frame(), existing_df, on='_k', how='left')
+            insert_mask = matched['_d'].isna().to_numpy()
+            update_mask = ~insert_mask & (csv_dates.to_numpy() > matched['_d'].to_numpy())
+            keep = insert_mask | update_mask
+            df_clean = df_clean[keep]
+
+            # --- Stage and Merge in Commit Batches ---
+            # Each batch is staged, merged and committed on its own, keeping transactions small
+            # Chunks are built in table column order, so rows can be taken without re-selecting columns
+            stage_rows = list(df_clean.itertuples(index=False, name=None))
+            if stage_rows:
+                status_callback(f"Uploading {int(insert_mask.sum())} new and {int(update_mask.sum())} newer rows "
+                                f"from CSV rows {chunk_first_row + 1}-{original_csv_rows}...")
+            batch_start = 0
             try:
-                # Check if title exists
-                cursor.execute(sql_select, current_title)
-                existing_row = cursor.fetchone()
-                existing_date = existing_row[0] if existing_row else None
-
-                if existing_date is None:
-                    # Title not found, insert new row
-                    status_callback(f"Row {rows_processed_total}/{rows_to_process}: Inserting new title '{current_title[:30]}...'")
-                    cursor.execute(sql_insert, row_values)
-                    conn.commit() # Commit insert
-                    rows_inserted += 1
-                else:
-                    # Title found, compare dates
-                    # Ensure existing_date is comparable (handle potential non-datetime types from DB)
-                    try:
-                        if not isinstance(existing_date, pd.Timestamp):
-                             existing_date = pd.Timestamp(existing_date)
-                    except Exception:
-                         # If DB date is invalid, treat CSV as newer (or log warning)
-                         existing_date = DEFAULT_DATE # Or some very old date
-
-                    if current_date > existing_date:
-                        # CSV row is newer, delete existing and insert new
-                        status_callback(f"Row {rows_processed_total}/{rows_to_process}: Updating title '{current_title[:30]}...' (newer date)")
-                        cursor.execute(sql_delete, current_title)
-                        cursor.execute(sql_insert, row_values)
-                        conn.commit() # Commit delete+insert transaction
-                        rows_updated += 1
-                    else:
-                        # DB row is newer or same, skip
-                        status_callback(f"Row {rows_processed_total}/{rows_to_process}: Skipping title '{current_title[:30]}...' (DB newer or same)")
-                        rows_skipped_older += 1
-
+                for batch_start in range(0, len(stage_rows), commit_batch_size):
+                    # Missing values become None only for the batch being sent, not a copy of the whole frame
+                    batch = to_db_params(stage_rows[batch_start:batch_start + commit_batch_size])
+                    for chunk_start in range(0, len(batch), STAGE_CHUNK_SIZE):
+                        cursor.executemany(sql_stage_insert, batch[chunk_start:chunk_start + STAGE_CHUNK_SIZE])
+
+                    cursor.execute(sql_merge)
+                    merge_counts = cursor.fetchone()
+                    rows_inserted += (merge_counts[0] or 0) if merge_counts else 0
+                    rows_updated += (merge_counts[1] or 0) if merge_counts else 0
+                    cursor.execute("TRUNCATE TABLE #stage")
+                    conn.commit()
+
+                    rows_committed += len(batch)
+                    # Small commit batches would otherwise flood the GUI with updates
+                    if time.monotonic() - last_callback_time >= CALLBACK_INTERVAL_SECONDS:
+                        last_callback_time = time.monotonic()
+                        status_callback(f"Committed {rows_committed} rows to {target_table_name}.")
+                        progress_callback(chunk_first_row + len(df) * (batch_start + len(batch)) // len(stage_rows), total_csv_rows)
             except pyodbc.Error as ex:
-                conn.rollback() # Rollback transaction on error
-                # *** ADDED DETAILED LOGGING ***
+                conn.rollback() # Only the current batch is lost; earlier batches stay committed
                 sqlstate = ex.args[0]
-                error_message_detail = f"Database error (SQLSTATE: {sqlstate}) processing row {rows_processed_total} (Title: {current_title}): {ex}"
+                error_message_detail = (f"Database error (SQLSTATE: {sqlstate}) while merging a batch from CSV rows "
+                                        f"{chunk_first_row + 1}-{original_csv_rows}: {ex}\n"
+                                        f"{rows_committed} rows were committed before the error.")
                 print(f"ERROR: {error_message_detail}") # Print detailed error to console
-                # Log the problematic row data
-                print(f"--- Failing Row Data ---")
-                try:
-                    # Attempt to print as dictionary, handle potential issues
-                    print(row.to_dict())
-                except Exception as print_ex:
-                    print(f"(Error printing row data: {print_ex})")
-                    print(row) # Fallback to printing the Series object
-                print(f"-----------------------")
-                # Return the detailed message to the GUI
                 return False, error_message_detail
             except Exception as e:
                 conn.rollback()
-                error_message = f"Unexpected error processing row {rows_processed_total} (Title: {current_title}): {e}"
-                print(f"ERROR: {error_message}") # Print general error too
-                print(f"--- Failing Row Data ---")
-                try:
-                    print(row.to_dict())
-                except Exception as print_ex:
-                    print(f"(Error printing row data: {print_ex})")
-                    print(row)
-                print(f"-----------------------")
+                error_message = (f"Unexpected error while merging a batch from CSV rows "
+                                 f"{chunk_first_row + 1}-{original_csv_rows}: {e}\n"
+                                 f"{rows_committed} rows were committed before the error.")
+                print(f"ERROR: {error_message}")
                 return False, error_message
 
-            # Update progress bar
-            progress_callback(rows_processed_total, rows_to_process)
-            # Optional: Add a small sleep to prevent overwhelming the DB/GUI?
-            # time.sleep(0.01)
+            # Later chunks compare against what this chunk just wrote (always newer than the snapshot)
+            written = pd.DataFrame({'_k': title_keys[keep].to_numpy(), '_d': csv_dates[keep].to_numpy()})
+            existing_df = pd.concat([existing_df, written], ignore_index=True).drop_duplicates('_k', keep='last')
+            progress_callback(original_csv_rows, total_csv_rows)
+
+        if rows_skipped_empty_title > 0:
+            status_callback(f"Skipped {rows_skipped_empty_title} rows due to missing '{key_column}'.")
+        if rows_processed_total == 0:
+             return True, f"No valid rows remaining after filtering for missing '{key_column}'. Processed {original_csv_rows} CSV rows."
 
+        rows_skipped_older = rows_processed_total - rows_inserted - rows_updated
 
         final_message = (f"Successfully processed {original_csv_rows} CSV rows.\n"
                          f"Skipped {rows_skipped_empty_title} rows due to missing '{key_column}'.\n"
@@ -301,9 +442,13 @@ def insert_csv_to_db(csv_path, status_callback, progress_callback):
                          f"- Inserted: {rows_inserted}\n"
                          f"- Updated: {rows_updated}\n"
                          f"- Skipped (DB newer/same): {rows_skipped_older}")
-        status_callback("Individual row processing completed.")
+        status_callback("Batch merge completed.")
         return True, final_message
 
+    except UnicodeDecodeError:
+        # Chunks are decoded lazily, so a bad byte past the header surfaces from the chunk loop
+        return False, (f"Error: Could not decode the file using UTF-8. Please ensure the file is saved in UTF-8 format.\n"
+                       f"{rows_committed} rows were committed before the error.")
     except pyodbc.Error as ex:
          # ... (connection error handling) ...
          return False, f"Database connection or initial query error: {ex}" # Simplified
@@ -3,6 +3,8 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, Scale, HORIZONTAL, Label
 import asyncio
 import threading
+import multiprocessing
+import queue
 import os
 
 # Import all handlers/scrapers
@@ -11,6 +13,23 @@ from .listed_scraper import ListedGameScraper
 from .data_handler import DatabaseHandler
 from .db_inserter import insert_csv_to_db
 
+# Status/progress updates from worker threads are coalesced into one Tk update per interval
+GUI_REFRESH_MS = 50
+
+def _db_insert_worker(input_csv_path, updates):
+    """Runs insert_csv_to_db in a child process, sending status/progress/result tuples to the GUI."""
+    try:
+        updates.put(('status', f"Starting DB insert for {os.path.basename(input_csv_path)}..."))
+        success, message = insert_csv_to_db(
+            input_csv_path,
+            lambda message: updates.put(('status', message)),
+            lambda current, total: updates.put(('progress', current, total)),
+        )
+    except Exception as e:
+        print(f"🚨 Unexpected error during DB insert: {e}")
+        success, message = False, f"An unexpected error occurred during the DB insert process: {e}"
+    updates.put(('done', success, message))
+
 class AppGUI:
     def __init__(self, root):
         self.root = root
@@ -74,6 +93,13 @@ class AppGUI:
         self.progress_bar.pack(pady=5, fill=tk.X)
 
         self.active_thread = None
+        self.db_handler = None # Created on first DB process run, then reused
+
+        # Latest status/progress waiting to be drawn by _flush_updates
+        self._pending_status = None
+        self._pending_progress = None
+        self._flush_scheduled = False
+        self._flush_lock = threading.Lock()
 
     def _disable_buttons(self):
         """Disables all action buttons."""
@@ -93,10 +119,37 @@ class AppGUI:
 
     def update_status(self, message):
         """Updates the status label from a thread."""
-        self.root.after(0, lambda: self.status_label.config(text=message))
+        with self._flush_lock:
+            self._pending_status = message
+        self._schedule_flush()
 
     def update_progress(self, current, total):
         """Updates the progress bar and label from a thread."""
+        with self._flush_lock:
+            self._pending_progress = (current, total)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        """Schedules one _flush_updates call unless one is already pending."""
+        with self._flush_lock:
+            if self._flush_scheduled:
+                return
+            self._flush_scheduled = True
+        self.root.after(GUI_REFRESH_MS, self._flush_updates)
+
+    def _flush_updates(self):
+        """Draws the latest pending status and progress (runs on the Tk thread)."""
+        with self._flush_lock:
+            status, self._pending_status = self._pending_status, None
+            progress, self._pending_progress = self._pending_progress, None
+            self._flush_scheduled = False
+        if status is not None:
+            self.status_label.config(text=status)
+        if progress is not None:
+            self._draw_progress(*progress)
+
+    def _draw_progress(self, current, total):
+        """Sets the progress bar and label."""
         if total > 0:
             percentage = (current / total) * 100
             self.progress_label.config(text=f"Progress: {current}/{total} ({percentage:.1f}%)")
@@ -105,7 +158,6 @@ class AppGUI:
         else:
             self.progress_label.config(text="Progress: 0/0 (0.0%)")
             self.progress_bar['value'] = 0
-        self.root.update_idletasks()
 
     def run_listed_scrape_in_thread(self, input_csv_path):
         """Runs the ListedGameScraper in the asyncio event loop via a thread."""
@@ -191,9 +243,10 @@ class AppGUI:
         """Runs the async DatabaseHandler process in the asyncio event loop via a thread."""
         try:
             self.status_label.config(text="Database process started... Check console.")
-            handler = DatabaseHandler()
-            if not handler.config:
-                raise ValueError("DatabaseHandler failed to initialize (config error).")
+            # Reuse one handler so its Azure AD token and SQL connection survive between runs
+            if self.db_handler is None:
+                self.db_handler = DatabaseHandler()
+            handler = self.db_handler
 
             success = asyncio.run(handler.run_db_process())
 
@@ -228,28 +281,45 @@ class AppGUI:
         )
         self.active_thread.start()
 
-    def run_db_insert_in_thread(self, input_csv_path):
-        """Runs the database insertion process in a thread."""
+    def _poll_db_insert(self, process, updates):
+        """Applies queued updates from the DB insert process and re-schedules itself until it finishes."""
+        done = None
+        status = progress = None
+        # Checked before draining: a child that exits after this check has already queued its
+        # 'done' (the queue is flushed at exit), so the drain below still picks it up
+        alive = process.is_alive()
         try:
-            self.update_status(f"Starting DB insert for {os.path.basename(input_csv_path)}...")
-            self.update_progress(0, 0)
-
-            success, message = insert_csv_to_db(input_csv_path, self.update_status, self.update_progress)
-
-            if success:
-                self.update_status(f"DB Insert finished. {message}")
-                messagebox.showinfo("Success", f"Database insert completed!\n{message}")
-            else:
-                self.update_status(f"DB Insert failed. {message}")
-                messagebox.showerror("Error", f"Database insert failed.\n{message}")
+            while True:
+                update = updates.get_nowait()
+                if update[0] == 'status':
+                    status = update[1]
+                elif update[0] == 'progress':
+                    progress = update[1:]
+                elif update[0] == 'done':
+                    done = update[1:]
+        except queue.Empty:
+            pass
+
+        # Only the latest status/progress in this poll is worth drawing
+        if status is not None:
+            self.status_label.config(text=status)
+        if progress is not None:
+            self._draw_progress(*progress)
+
+        if done is None and alive:
+            self.root.after(GUI_REFRESH_MS, self._poll_db_insert, process, updates)
+            return
 
-        except Exception as e:
-            error_msg = f"Unexpected error during DB insert: {e}"
-            print(f"🚨 {error_msg}")
-            self.update_status(error_msg)
-            messagebox.showerror("Error", f"An unexpected error occurred during the DB insert process: {e}")
-        finally:
-            self.root.after(0, self._enable_buttons)
+        if done is None:
+            done = (False, f"DB insert process exited unexpectedly (exit code {process.exitcode}).")
+        success, message = done
+        if success:
+            self.status_label.config(text=f"DB Insert finished. {message}")
+            messagebox.showinfo("Success", f"Database insert completed!\n{message}")
+        else:
+            self.status_label.config(text=f"DB Insert failed. {message}")
+            messagebox.showerror("Error", f"Database insert failed.\n{message}")
+        self._enable_buttons()
 
     def start_db_insert_thread(self):
         """Handles file selection and starts the DB insertion process in a thread."""
@@ -271,15 +341,23 @@ class AppGUI:
         self.update_status("Starting database insert thread...")
         self.update_progress(0, 0)
 
-        self.active_thread = threading.Thread(
-            target=self.run_db_insert_in_thread,
-            args=(input_csv_path,),
+        # pandas cleaning and pyodbc marshaling hold the GIL, so the insert runs in its own
+        # process and reports back through a queue polled from the Tk loop
+        updates = multiprocessing.Queue()
+        self.active_thread = multiprocessing.Process(
+            target=_db_insert_worker,
+            args=(input_csv_path, updates),
             daemon=True
         )
         self.active_thread.start()
+        self.root.after(GUI_REFRESH_MS, self._poll_db_insert, self.active_thread, updates)
 
 def start_gui():
     """Initializes and runs the Tkinter GUI."""
     root = tk.Tk()
     app = AppGUI(root)
     root.mainloop()
+    # Release the connections the reused DatabaseHandler kept open between runs
+    if app.db_handler is not None:
+        app.db_handler.close_mongo_client()
+        app.db_handler.close_sql_connection()
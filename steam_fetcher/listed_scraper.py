@@ -1,10 +1,48 @@
 # steam_fetcher/listed_scraper.py
 import os
+import csv
 import asyncio
 import pandas as pd
-from playwright.async_api import async_playwright
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 import time # Keep for potential delays if needed
 
+# Finds the first grid row whose title cell equals term (case-insensitively) in the browser;
+# returns the rendered row count and that row's title and class (null if none matched)
+EXACT_MATCH_JS = """
+([gridSelector, titleIndex, term]) => {
+    const rows = document.querySelectorAll(gridSelector + " div[role='row']");
+    const target = term.toLowerCase();
+    for (const row of rows) {
+        const cells = row.querySelectorAll("div[role='gridcell']");
+        if (cells.length <= titleIndex) continue; // e.g. header row
+        const title = cells[titleIndex].innerText.trim();
+        if (title.toLowerCase() === target) return {rowCount: rows.length, title: title, cls: row.className};
+    }
+    return {rowCount: rows.length, title: null, cls: null};
+}
+"""
+
+# Output rows written between explicit flushes, so progress survives a crash
+OUTPUT_FLUSH_ROWS = 50
+
+# Input columns with at most this share of distinct values are stored as categories
+INPUT_CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+# True once the grid shows a row whose title exactly (case-insensitively) matches the search term.
+# Pages are reused between searches, so weaker signals could fire on the previous term's results;
+# a miss simply runs into the caller's timeout.
+SEARCH_SETTLED_JS = """
+([gridSelector, titleIndex, expected]) => {
+    const grid = document.querySelector(gridSelector);
+    if (!grid) return false;
+    const target = expected.toLowerCase();
+    return Array.from(grid.querySelectorAll("div[role='row']")).some(row => {
+        const cells = row.querySelectorAll("div[role='gridcell']");
+        return cells.length > titleIndex && cells[titleIndex].innerText.trim().toLowerCase() === target;
+    });
+}
+"""
+
 class ListedGameScraper:
     """
     Scrapes game data from checkmydeck.ofdgn.com based on a list of game titles
@@ -15,12 +53,17 @@ class ListedGameScraper:
         self.input_csv_path = input_csv_path
         self.output_csv_path = output_csv_path
         self.login_wait = 60000  # 60 seconds for manual login
+        # Browser profile kept between runs, so a login only has to happen once
+        self.profile_dir = ".pw_profile"
+        self.logged_in_check_wait = 10000 # How long the grid gets to load before assuming a login is needed
         self.search_wait = 3000   # Reduced wait after search term input, adjust if needed
         # Assuming the game title to search for is in the first column (index 0) of the input CSV
         self.search_term_column_index = 0
         # Assuming the game title in the web grid is the second data cell (index 1)
         # Cells: [Last Change (0), Title (1), Developer (2), Reviews (3), Price (4), Discount (5), ProtonDB (6)]
         self.web_title_cell_index = 1
+        # Number of browser pages searching in parallel (each waits on its own filter debounce)
+        self.scrape_concurrency = 4
 
 
     def _read_input_csv(self):
@@ -31,12 +74,24 @@ class ListedGameScraper:
                 return None
 
             # Read the entire CSV, keeping the header
-            df_input = pd.read_csv(self.input_csv_path, keep_default_na=False) # keep_default_na=False to treat empty strings as such
+            # Every column stays text, so the echoed input is written back exactly as read
+            # (no reformatted dates, no lost leading zeros)
+            try:
+                df_input = pd.read_csv(self.input_csv_path, keep_default_na=False, dtype=str, engine='pyarrow') # Multithreaded parser
+            except (ImportError, TypeError, ValueError):
+                # pyarrow (or a pandas version supporting it) not available
+                df_input = pd.read_csv(self.input_csv_path, keep_default_na=False, dtype=str) # keep_default_na=False to treat empty strings as such
 
             if df_input.empty:
                  print(f"🚨 Error: Input CSV file '{self.input_csv_path}' is empty.")
                  return None
 
+            # Store columns with many repeated values (publisher, genre, ...) as categories
+            for column in df_input.columns:
+                values = df_input[column]
+                if values.nunique() / len(values) <= INPUT_CATEGORY_MAX_UNIQUE_RATIO:
+                    df_input[column] = values.astype('category')
+
             # Check if the search term column index is valid
             if self.search_term_column_index >= len(df_input.columns):
                  print(f"🚨 Error: Search term column index ({self.search_term_column_index}) is out of bounds for input CSV with {len(df_input.columns)} columns.")
@@ -66,50 +121,36 @@ class ListedGameScraper:
             # Clear previous search and type new term
             await search_box.fill("")
             await search_box.fill(search_term)
-            # print(f"  ⏳ Waiting {self.search_wait / 1000}s for filter...")
-            await page.wait_for_timeout(self.search_wait) # Wait for JS filtering
-
-            # Re-fetch rows after search
-            rows = await page.query_selector_all(f"{grid_selector} div[role='row']")
-            # print(f"  📊 Found {len(rows)} rows potentially matching.")
-
-            if not rows:
+            # Wait for the filtered grid to reflect the term, at most search_wait
+            try:
+                await page.wait_for_function(
+                    SEARCH_SETTLED_JS,
+                    arg=[grid_selector, self.web_title_cell_index, search_term],
+                    timeout=self.search_wait
+                )
+            except PlaywrightTimeoutError:
+                pass # No exact match appeared within the wait; read whatever the grid shows
+
+            # Match the title in the page; only the matching row comes back
+            match = await page.evaluate(EXACT_MATCH_JS, [grid_selector, self.web_title_cell_index, search_term])
+
+            if not match['rowCount']:
                 print(f"  ❌ No rows found in grid after searching for '{search_term}'.")
                 return None # No rows means no match
 
-            for row in rows:
-                cells = await row.query_selector_all("div[role='gridcell']")
-                if len(cells) > self.web_title_cell_index:
-                    try:
-                        web_title = (await cells[self.web_title_cell_index].inner_text()).strip()
-
-                        # --- Exact, Case-Insensitive Match ---
-                        if web_title.lower() == search_term.lower():
-                            print(f"  ✅ Found exact match: '{web_title}'")
-                            # Extract Status from the row's class attribute
-                            status = "N/A" # Default status
-                            try:
-                                class_attr = await row.get_attribute("class") or ""
-                                classes = class_attr.split()
-                                potential_status = classes[-1] if classes else ""
-                                if potential_status.startswith("status-"):
-                                     status = potential_status.replace("status-", "").capitalize()
-                                elif len(classes) > 1: # Fallback if no 'status-' prefix
-                                    status = classes[-1]
-                            except Exception as class_error:
-                                print(f"  ⚠️ Error extracting status from class for '{search_term}': {class_error}")
-
-                            found_status = status
-                            break # Stop searching once exact match is found
-                        # else:
-                            # print(f"  ℹ️ Row title '{web_title}' doesn't exactly match '{search_term}'.")
-
-                    except Exception as cell_error:
-                        print(f"  ⚠️ Error reading cell {self.web_title_cell_index} for '{search_term}': {cell_error}")
-                        continue # Skip row if cell reading fails
-                # else:
-                    # print(f"  ⚠️ Row doesn't have enough cells ({len(cells)}) to check title index {self.web_title_cell_index}.")
+            # --- Exact, Case-Insensitive Match ---
+            if match['title'] is not None:
+                print(f"  ✅ Found exact match: '{match['title']}'")
+                # Extract Status from the row's class attribute
+                status = "N/A" # Default status
+                classes = (match['cls'] or "").split()
+                potential_status = classes[-1] if classes else ""
+                if potential_status.startswith("status-"):
+                     status = potential_status.replace("status-", "").capitalize()
+                elif len(classes) > 1: # Fallback if no 'status-' prefix
+                    status = classes[-1]
 
+                found_status = status
 
             if found_status is None:
                 print(f"  ❌ No exact match found for '{search_term}' in the filtered results.")
@@ -120,25 +161,24 @@ class ListedGameScraper:
             print(f"  🚨 An error occurred while searching for '{search_term}': {e}")
             return None # Return None on error to indicate failure for this term
 
-    def _write_output_csv(self, output_data, output_headers):
-        """Writes the collected data (list of lists) to the output CSV file."""
-        if not output_data:
-            print("ℹ️ No data was processed to write.")
-            return False
+    async def _open_search_page(self, context, url, grid_selector, search_input_selector):
+        """Opens another page in the (logged-in) context and returns (page, search_box)."""
+        page = await context.new_page()
+        await page.goto(url, timeout=60000)
+        await page.wait_for_selector(grid_selector, timeout=30000)
+        search_box = await page.wait_for_selector(search_input_selector, timeout=30000)
+        return page, search_box
 
+    def _open_output_csv(self, output_headers):
+        """Creates the output CSV with its header row and returns (file, csv_writer)."""
         output_dir = os.path.dirname(self.output_csv_path)
         if output_dir: # Ensure directory exists only if it's not the current dir
              os.makedirs(output_dir, exist_ok=True)
 
-        print(f"\n💾 Writing {len(output_data)} total rows to {self.output_csv_path}...")
-        try:
-            df_results = pd.DataFrame(output_data, columns=output_headers)
-            df_results.to_csv(self.output_csv_path, mode='w', header=True, index=False, encoding='utf-8-sig')
-            print(f"✅ Results saved successfully to '{self.output_csv_path}'")
-            return True
-        except Exception as e:
-            print(f"🚨 An error occurred while writing the output CSV to '{self.output_csv_path}': {e}")
-            return False
+        output_file = open(self.output_csv_path, 'w', newline='', encoding='utf-8-sig', buffering=1 << 16)
+        writer = csv.writer(output_file)
+        writer.writerow(output_headers)
+        return output_file, writer
 
 
     async def run_scrape(self):
@@ -149,62 +189,116 @@ class ListedGameScraper:
 
         # Prepare output headers (original headers + new column)
         output_headers = df_input.columns.tolist() + ["SteamOSResult"]
-        output_data = [] # To store list of lists for output rows
 
         async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=False)
-            context = await browser.new_context()
-            page = await context.new_page()
+            context = await p.chromium.launch_persistent_context(user_data_dir=self.profile_dir, headless=False)
+            page = context.pages[0] if context.pages else await context.new_page()
 
             url = "https://checkmydeck.ofdgn.com/all-games?sort=deck-compat-last-change-desc"
+            grid_selector = "div[role='grid']"
+            search_input_selector = "input[placeholder='Type to filter']"
             try:
                 await page.goto(url, timeout=60000)
-                print(f"🚀 Browser opened to {url}. Please log in manually if required. Waiting {self.login_wait / 1000} seconds...")
-                await page.wait_for_timeout(self.login_wait)
+                try:
+                    # Session restored from the saved profile: the grid loads without a login
+                    await page.wait_for_selector(grid_selector, timeout=self.logged_in_check_wait)
+                    print(f"🚀 Browser opened to {url} with the saved profile. Skipping the login wait.")
+                except PlaywrightTimeoutError:
+                    print(f"🚀 Browser opened to {url}. Please log in manually if required. Waiting {self.login_wait / 1000} seconds...")
+                    await page.wait_for_timeout(self.login_wait)
 
-                grid_selector = "div[role='grid']"
-                search_input_selector = "input[placeholder='Type to filter']"
                 await page.wait_for_selector(grid_selector, timeout=30000)
                 search_box_element = await page.wait_for_selector(search_input_selector, timeout=30000)
                 print("✅ Grid and search bar loaded.")
 
             except Exception as e:
                 print(f"🚨 Error during initial page load or finding elements: {e}")
-                await browser.close()
+                await context.close()
                 return False # Indicate failure
 
             if not search_box_element:
                 print(f"🚨 Could not find the search input element.")
-                await browser.close()
+                await context.close()
                 return False # Indicate failure
 
+            # --- Open extra search pages sharing the logged-in context ---
+            extra_pages = await asyncio.gather(
+                *[self._open_search_page(context, url, grid_selector, search_input_selector)
+                  for _ in range(self.scrape_concurrency - 1)],
+                return_exceptions=True
+            )
+            page_pool = asyncio.Queue()
+            page_pool.put_nowait((page, search_box_element))
+            for extra_page in extra_pages:
+                if isinstance(extra_page, Exception):
+                    print(f"⚠️ Could not open an extra search page: {extra_page}")
+                else:
+                    page_pool.put_nowait(extra_page)
+            worker_count = page_pool.qsize()
+            print(f"✅ Searching with {worker_count} page(s) in parallel.")
+            semaphore = asyncio.BoundedSemaphore(worker_count)
+
+            # --- Open the output CSV; rows are written as soon as they are done ---
+            try:
+                output_file, writer = self._open_output_csv(output_headers)
+            except OSError as e:
+                print(f"🚨 An error occurred while creating the output CSV '{self.output_csv_path}': {e}")
+                await context.close()
+                return False
+            print(f"💾 Writing results to {self.output_csv_path} as they complete...")
+
             # --- Iterate through input DataFrame rows ---
             total_rows = len(df_input)
-            for index, row in df_input.iterrows():
-                search_term = str(row.iloc[self.search_term_column_index]).strip() # Get search term from configured column
-                print(f"\nProcessing row {index + 1}/{total_rows}: '{search_term}'")
-
-                if not search_term:
-                    print("  ⚠️ Skipping row due to empty search term.")
-                    status_result = "Skipped (Empty)"
-                else:
-                    # Find the status for the exact match
-                    status_result = await self._find_exact_match_status(page, search_box_element, search_term, grid_selector)
-                    if status_result is None:
-                        status_result = "Not Found" # Use "Not Found" if scraping failed or no match
+            finished_rows = {} # position -> output row, held until all earlier rows are written
+            next_to_write = 0
+
+            def write_ready_rows():
+                """Writes the finished rows that directly follow the last written one, keeping input order."""
+                nonlocal next_to_write
+                while next_to_write in finished_rows:
+                    writer.writerow(finished_rows.pop(next_to_write))
+                    next_to_write += 1
+                    if next_to_write % OUTPUT_FLUSH_ROWS == 0:
+                        output_file.flush()
+
+            async def process_row(position, search_term, row_values):
+                """Searches one input row on a free page and stores its output row."""
+                async with semaphore:
+                    print(f"\nProcessing row {position + 1}/{total_rows}: '{search_term}'")
+
+                    if not search_term:
+                        print("  ⚠️ Skipping row due to empty search term.")
+                        status_result = "Skipped (Empty)"
+                    else:
+                        search_page, search_box = await page_pool.get()
+                        try:
+                            # Find the status for the exact match
+                            status_result = await self._find_exact_match_status(search_page, search_box, search_term, grid_selector)
+                        finally:
+                            page_pool.put_nowait((search_page, search_box))
+                        if status_result is None:
+                            status_result = "Not Found" # Use "Not Found" if scraping failed or no match
 
                 # Construct the output row: original data + status result
-                output_row = row.tolist() + [status_result]
-                output_data.append(output_row)
+                finished_rows[position] = row_values + [status_result]
+                write_ready_rows()
 
-                # Optional small delay between searches if needed to avoid rate limiting
-                # await asyncio.sleep(0.2)
+            # Search terms (from the configured column) and raw row values, extracted column-wise once
+            search_terms = df_input.iloc[:, self.search_term_column_index].astype(str).str.strip().tolist()
+            rows_as_lists = df_input.values.tolist()
+
+            try:
+                await asyncio.gather(*[process_row(position, search_term, row_values)
+                                       for position, (search_term, row_values) in enumerate(zip(search_terms, rows_as_lists))])
+            finally:
+                output_file.close()
+                print(f"💾 {next_to_write} rows saved to '{self.output_csv_path}'")
 
-            await browser.close()
+            await context.close()
             print("\n🔒 Browser closed.")
 
-        # Write the final results
-        return self._write_output_csv(output_data, output_headers)
+        print(f"✅ Results saved successfully to '{self.output_csv_path}'")
+        return True
 
 # Example of how to run this class (for testing)
 # async def test_run():
@@ -1,8 +1,9 @@
 # scraper.py
 import os
+import csv
 import asyncio
 import pandas as pd
-from playwright.async_api import async_playwright
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 from playwright_stealth import stealth_async # Import stealth
 
 EXPECTED_COLUMNS = 9   # 8 data columns + SteamOSResultStatus
@@ -10,9 +11,87 @@ MAX_ROWS = 200000
 SCROLL_AMOUNT = 500
 SCROLL_WAIT = 10000  # Increased wait time
 LOGIN_WAIT = 120000 # Increased login/manual interaction wait to 120 seconds
-BATCH_INTERVAL = 10
+FLUSH_ROWS = 5000 # Write collected rows once this many are pending
+FLUSH_INTERVAL_SECONDS = 30 # ...or at least this often, so a slow scrape still saves its progress
+MAX_BACK_SCROLL_ATTEMPTS = 20 # Limit scrolling back after jumping past the starting row
 CSV_FILENAME = "scraped_data.csv" # Consider making this configurable or returning data
 
+# Highest aria-rowindex currently rendered in the grid
+MAX_ROW_INDEX_JS = """
+() => Math.max(0, ...Array.from(
+    document.querySelectorAll("div[role='row'][aria-rowindex]"),
+    row => parseInt(row.getAttribute('aria-rowindex'), 10) || 0
+))
+"""
+
+# Lowest aria-rowindex currently rendered, ignoring the header row (index 1)
+MIN_ROW_INDEX_JS = """
+() => Math.min(Infinity, ...Array.from(
+    document.querySelectorAll("div[role='row'][aria-rowindex]"),
+    row => parseInt(row.getAttribute('aria-rowindex'), 10) || Infinity
+).filter(index => index > 1))
+"""
+
+# Sets the grid's scrollTop so rows just before targetIdx are rendered, assuming a uniform row height
+JUMP_TO_ROW_JS = """
+([gridSelector, targetIdx]) => {
+    const grid = document.querySelector(gridSelector);
+    const row = grid && grid.querySelector("div[role='row'][aria-rowindex]:not([aria-rowindex='1'])");
+    if (!row || !row.offsetHeight) return false;
+    grid.scrollTop = Math.max(0, (targetIdx - 2) * row.offsetHeight - grid.clientHeight / 2);
+    return true;
+}
+"""
+
+# Counts rows the grid adds (or re-indexes when recycling row nodes) in window.__rowChanges,
+# so waits can poll a number instead of rescanning the grid
+ROW_OBSERVER_JS = """
+(gridSelector) => {
+    if (window.__rowChanges !== undefined) return;
+    window.__rowChanges = 0;
+    const isRow = node => node.nodeType === 1 &&
+        (node.matches("div[role='row']") || node.querySelector("div[role='row']") !== null);
+    new MutationObserver(mutations => {
+        for (const mutation of mutations) {
+            if (mutation.type === 'attributes') {
+                window.__rowChanges++;
+            } else {
+                for (const node of mutation.addedNodes) {
+                    if (isRow(node)) window.__rowChanges++;
+                }
+            }
+        }
+    }).observe(document.querySelector(gridSelector),
+               {childList: true, subtree: true, attributes: true, attributeFilter: ['aria-rowindex']});
+}
+"""
+
+# Number of rendered rows, plus index, first 7 cell texts and SteamOS status (from the row's class)
+# of the rows at or past minIdx in row order, in one browser round trip
+ROW_BATCH_JS = """
+(minIdx) => {
+    const rendered = document.querySelectorAll("div[role='row']");
+    const rows = [];
+    for (const row of rendered) {
+        const index = parseInt(row.getAttribute('aria-rowindex'), 10);
+        if (!(index >= minIdx)) continue; // Also drops rows without a usable index
+        const classes = row.classList;
+        rows.push({
+            idx: index,
+            cells: Array.from(row.querySelectorAll("div[role='gridcell']"), cell => cell.innerText.trim()).slice(0, 7),
+            status: classes.contains('verified') ? 'Verified'
+                  : classes.contains('playable') ? 'Playable'
+                  : classes.contains('unsupported') ? 'Unsupported'
+                  : 'Unknown'
+        });
+    }
+    rows.sort((a, b) => a.idx - b.idx); // Recycled row nodes can be out of DOM order
+    return {rendered: rendered.length, rows: rows};
+}
+"""
+
+RESUME_TAIL_BYTES = 64 * 1024 # Bytes read from the end of the CSV to find the resume row
+
 # Update column names to match the required order
 column_names = [
     "Row Number",    # 1 (for tracking, not in your requested output but kept for uniqueness)
@@ -26,6 +105,67 @@ column_names = [
     "SteamOSResultStatus" # 9 (Derived from row class)
 ]
 
+def _tail_row_number(path):
+    """Returns the highest Row Number among the last lines of the CSV, or None if none can be parsed."""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        pos = max(0, size - RESUME_TAIL_BYTES)
+        f.seek(pos)
+        lines = f.read().splitlines()
+    if pos > 0:
+        lines = lines[1:] # First line is probably cut off
+    row_numbers = []
+    for line in lines:
+        try:
+            row_numbers.append(int(line.split(b',', 1)[0]))
+        except ValueError:
+            continue # Header, blank or partially written line
+    return max(row_numbers) if row_numbers else None
+
+def _process_batch(rows, seen_indices, rows_left):
+    """
+    Turns one pass of ROW_BATCH_JS results into CSV rows, skipping rows in seen_indices.
+    Doesn't modify its arguments, so it can run off the event loop.
+    Returns (new_rows, highest row index in the pass, indices of incomplete rows, whether rows_left was hit).
+    """
+    new_rows = []
+    max_index = 0
+    incomplete_indices = [] # Rows skipped this pass that must be fetched again
+    for row in rows:
+        row_index = row['idx']
+
+        # Update the highest row index seen on this page load
+        max_index = max(max_index, row_index)
+
+        # Skip rows already processed
+        if row_index in seen_indices:
+            continue
+
+        # Stop if we exceed the overall MAX_ROWS limit
+        if len(new_rows) >= rows_left:
+            return new_rows, max_index, incomplete_indices, True
+
+        # Expecting 7 data cells + 1 status derived from class
+        cells = row['cells']
+        if len(cells) < 7:
+            # Only print warning for non-header rows with unexpected cell count
+            if row_index != 1:
+                print(f"⚠️ Skipping row {row_index}: Expected at least 7 cells, found {len(cells)}.")
+                incomplete_indices.append(row_index)
+            continue # Skip header row (index 1) or rows with too few cells
+
+        # Row Number, the text of the first 7 cells, then the status derived in the page
+        row_data = [row_index] + cells + [row['status']]
+
+        # Final check for expected column count
+        if len(row_data) != EXPECTED_COLUMNS:
+            print(f"⚠️ Skipping row {row_index}: Data mismatch. Expected {EXPECTED_COLUMNS} columns, got {len(row_data)}. Data: {row_data}")
+            continue
+
+        new_rows.append(row_data)
+    return new_rows, max_index, incomplete_indices, False
+
 async def run_full_scrape():
     """
     Performs a full scrape of game data from checkmydeck.ofdgn.com.
@@ -33,25 +173,34 @@ async def run_full_scrape():
     start_row = 1
     if os.path.exists(CSV_FILENAME):
         try:
-            df_existing = pd.read_csv(CSV_FILENAME)
-            if not df_existing.empty and "Row Number" in df_existing.columns:
-                # Ensure the column is numeric before calling max()
-                numeric_rows = pd.to_numeric(df_existing["Row Number"], errors='coerce')
-                numeric_rows = numeric_rows.dropna() # Remove non-numeric rows if any
-                if not numeric_rows.empty:
-                    start_row = int(numeric_rows.max()) + 1
+            # Rows are appended in increasing order, so the tail holds the highest Row Number
+            last_row = _tail_row_number(CSV_FILENAME)
+            if last_row is not None:
+                start_row = last_row + 1
+            else:
+                # Fall back to scanning the whole file
+                df_existing = pd.read_csv(CSV_FILENAME)
+                if not df_existing.empty and "Row Number" in df_existing.columns:
+                    # Ensure the column is numeric before calling max()
+                    numeric_rows = pd.to_numeric(df_existing["Row Number"], errors='coerce')
+                    numeric_rows = numeric_rows.dropna() # Remove non-numeric rows if any
+                    if not numeric_rows.empty:
+                        start_row = int(numeric_rows.max()) + 1
             print(f"Resuming from row {start_row}")
         except pd.errors.EmptyDataError:
             print(f"CSV file '{CSV_FILENAME}' is empty. Starting from row 1.")
         except Exception as e:
             print(f"Error reading CSV for resume info: {e}. Starting from row 1.")
 
-    unique_rows = {}
+    seen_indices = set() # Row indices already collected this session (written or pending)
+    pending = [] # Collected rows not yet written to the CSV, in the order they were collected
     processed_rows = 0
     no_new_rows_count = 0
     scroll_attempt = 0
-    written_keys = set()
+    total_written = 0
     max_row_seen = start_row - 1
+    max_row_collected = start_row - 1
+    min_row_index = start_row # Lowest row index the page still needs to send back
 
     # --- Connect to existing Chrome instance --- 
     async with async_playwright() as p:
@@ -124,6 +273,7 @@ async def run_full_scrape():
             print("⏳ Waiting for grid container...")
             await page.wait_for_selector("div[role='grid']", timeout=30000) # Wait for the grid to appear
             print("✅ Grid container found. Proceeding with data extraction...")
+            await page.evaluate(ROW_OBSERVER_JS, "div[role='grid']")
         except Exception as e:
             # Try taking a screenshot for debugging
             try:
@@ -135,14 +285,20 @@ async def run_full_scrape():
             print("Disconnected from browser.")
             return
 
-        async def scroll_table():
-            """Scrolls the grid container down."""
+        async def scroll_table(amount=SCROLL_AMOUNT):
+            """Scrolls the grid container down (or up, for a negative amount)."""
             try:
                 grid_container = await page.query_selector("div[role='grid']")
                 if grid_container:
-                    await grid_container.evaluate(f"node => node.scrollBy(0, {SCROLL_AMOUNT});")
-                    print(f"📜 Scrolled down by {SCROLL_AMOUNT} pixels. Waiting {SCROLL_WAIT / 1000}s...")
-                    await page.wait_for_timeout(SCROLL_WAIT)
+                    row_changes = await page.evaluate("window.__rowChanges")
+                    await grid_container.evaluate(f"node => node.scrollBy(0, {amount});")
+                    print(f"📜 Scrolled {'down' if amount > 0 else 'up'} by {abs(amount)} pixels. Waiting up to {SCROLL_WAIT / 1000}s for new rows...")
+                    # Continue as soon as the observer sees rows being rendered
+                    try:
+                        await page.wait_for_function("(previous) => window.__rowChanges > previous",
+                                                     arg=row_changes, timeout=SCROLL_WAIT)
+                    except PlaywrightTimeoutError:
+                        print("⏳ No new rows rendered within the wait.")
                 else:
                     print("🚨 Grid container not found during scroll attempt.")
                     return False # Indicate scroll failure
@@ -151,26 +307,34 @@ async def run_full_scrape():
                 return False # Indicate scroll failure
             return True # Indicate scroll success
 
+        # --- Jump close to the starting row instead of scrolling there step by step ---
+        if start_row > 1:
+            row_changes = await page.evaluate("window.__rowChanges")
+            if await page.evaluate(JUMP_TO_ROW_JS, ["div[role='grid']", start_row]):
+                print(f"⏩ Jumped the grid to around row {start_row}. Waiting up to {SCROLL_WAIT / 1000}s for rows to render...")
+                try:
+                    await page.wait_for_function("(previous) => window.__rowChanges > previous",
+                                                 arg=row_changes, timeout=SCROLL_WAIT)
+                except PlaywrightTimeoutError:
+                    print("⏳ No new rows rendered within the wait.")
+                # Row heights can vary, so back up if the jump overshot the starting row
+                back_scroll_attempt = 0
+                while back_scroll_attempt < MAX_BACK_SCROLL_ATTEMPTS and await page.evaluate(MIN_ROW_INDEX_JS) > start_row:
+                    back_scroll_attempt += 1
+                    print(f"⏪ Jump overshot row {start_row}. Scrolling back ({back_scroll_attempt}/{MAX_BACK_SCROLL_ATTEMPTS})...")
+                    if not await scroll_table(-SCROLL_AMOUNT):
+                        break
+            else:
+                print("⚠️ Could not measure the row height. Falling back to scrolling to the starting row.")
+
         # --- Pre-scroll to find the starting row ---
         pre_scroll_attempt = 0
         MAX_PRE_SCROLL_ATTEMPTS = 100 # Limit pre-scrolling
         found_target_in_pre_scroll = False
         while pre_scroll_attempt < MAX_PRE_SCROLL_ATTEMPTS:
-            rows = await page.query_selector_all("div[role='row']")
-            target_found = False
-            highest_row_index_on_page = -1
-            for row in rows:
-                row_index_str = await row.get_attribute("aria-rowindex")
-                if row_index_str:
-                    try:
-                        row_index = int(row_index_str)
-                        highest_row_index_on_page = max(highest_row_index_on_page, row_index)
-                        if row_index >= start_row:
-                            target_found = True
-                            break # Found a row at or past the start row
-                    except ValueError:
-                        continue # Skip if row index is not an integer
-            
+            highest_row_index_on_page = await page.evaluate(MAX_ROW_INDEX_JS)
+            target_found = highest_row_index_on_page >= start_row # A row at or past the start row is rendered
+
             if target_found:
                 print(f"✅ Found target rows (>= {start_row}) during pre-scroll. Starting extraction.")
                 found_target_in_pre_scroll = True
@@ -188,169 +352,117 @@ async def run_full_scrape():
             await browser.close()
             return # Exit if target row not found after pre-scrolling
 
-        # --- Main data extraction loop ---
-        while processed_rows < MAX_ROWS:
-            rows = await page.query_selector_all("div[role='row']")
-            print(f"📊 Found {len(rows)} row elements on the page.")
+        # --- Open the output CSV once for the whole run ---
+        is_new_file = not os.path.exists(CSV_FILENAME) or os.path.getsize(CSV_FILENAME) == 0
+        csv_file = open(CSV_FILENAME, 'a', newline='', encoding='utf-8', buffering=1 << 20)
+        csv_writer = csv.writer(csv_file)
+        if is_new_file:
+            csv_writer.writerow(column_names)
 
-            if not rows:
-                print("⚠️ No rows found on the page. Waiting and trying again...")
-                await page.wait_for_timeout(SCROLL_WAIT) # Wait longer if no rows found
-                if not await scroll_table():
-                     print("🚨 Scrolling failed after finding no rows. Aborting.")
-                     break # Exit loop if scroll fails
-                continue # Try fetching rows again
-
-            new_valid_rows_in_batch = 0
-            current_max_in_page = max_row_seen # Track max row index *seen* in this pass
-
-            for row in rows:
-                row_index_str = await row.get_attribute("aria-rowindex")
-                if not row_index_str:
-                    # print("⚠️ Skipping row: Missing 'aria-rowindex'.")
-                    continue
-                try:
-                    row_index = int(row_index_str)
-                except ValueError:
-                    # print(f"⚠️ Skipping row: Invalid 'aria-rowindex' ('{row_index_str}').")
-                    continue
+        def write_pending(label="Batch"):
+            """Appends the pending rows to the CSV and clears them from memory."""
+            nonlocal total_written
+            try:
+                csv_writer.writerows(pending)
+                csv_file.flush() # Written rows survive a crash
+                total_written += len(pending)
+                print(f"💾 {label} written to {CSV_FILENAME} with {len(pending)} rows. Total rows written this session: {total_written}. Cleared from memory.")
+                pending.clear()
+            except Exception as write_error:
+                 print(f"🚨 Error writing {label.lower()} to CSV: {write_error}")
 
-                # Update the highest row index seen on this page load
-                current_max_in_page = max(current_max_in_page, row_index)
+        async def flush_periodically():
+            """Writes whatever is pending every FLUSH_INTERVAL_SECONDS."""
+            while True:
+                await asyncio.sleep(FLUSH_INTERVAL_SECONDS)
+                if pending:
+                    write_pending("Periodic batch")
 
-                # Skip rows before the starting point or already processed
-                if row_index < start_row or row_index in unique_rows or row_index in written_keys:
-                    continue
+        periodic_flush_task = asyncio.create_task(flush_periodically())
 
-                # Stop if we exceed the overall MAX_ROWS limit
-                if len(unique_rows) + len(written_keys) >= MAX_ROWS:
+        # --- Main data extraction loop ---
+        try:
+            while processed_rows < MAX_ROWS:
+                batch = await page.evaluate(ROW_BATCH_JS, min_row_index) # Rows not collected yet, in one call
+                rows = batch['rows']
+                print(f"📊 Found {batch['rendered']} row elements on the page, {len(rows)} from row {min_row_index} on.")
+
+                if not batch['rendered']:
+                    print("⚠️ No rows found on the page. Waiting and trying again...")
+                    await page.wait_for_timeout(SCROLL_WAIT) # Wait longer if no rows found
+                    if not await scroll_table():
+                         print("🚨 Scrolling failed after finding no rows. Aborting.")
+                         break # Exit loop if scroll fails
+                    continue # Try fetching rows again
+
+                # Turn the pass into CSV rows in a worker thread, keeping the event loop free
+                new_rows, batch_max_index, incomplete_indices, limit_reached = await asyncio.to_thread(
+                    _process_batch, rows, seen_indices, MAX_ROWS - len(seen_indices))
+                current_max_in_page = max(max_row_seen, batch_max_index) # Track max row index *seen* in this pass
+
+                seen_indices.update(row_data[0] for row_data in new_rows)
+                pending.extend(new_rows)
+                if new_rows:
+                    max_row_collected = max(max_row_collected, new_rows[-1][0]) # Rows come back in index order
+                processed_rows += len(new_rows)
+                new_valid_rows_in_batch = len(new_rows)
+                if limit_reached:
                     print(f"🏁 Reached MAX_ROWS limit ({MAX_ROWS}). Stopping collection.")
                     processed_rows = MAX_ROWS # Ensure loop termination condition is met
-                    break # Exit inner loop
 
-                # Extract data from cells
-                row_data = [row_index] # Start with Row Number
-                cells = await row.query_selector_all("div[role='gridcell']")
+                # --- End of processing rows on current page ---
 
-                # Expecting 7 data cells + 1 status derived from class
-                if len(cells) < 7:
-                    # Only print warning for non-header rows with unexpected cell count
-                    if row_index != 1:
-                        print(f"⚠️ Skipping row {row_index}: Expected at least 7 cells, found {len(cells)}.")
-                    continue # Skip header row (index 1) or rows with too few cells
-
-                # Extract text from the first 7 cells
-                for i in range(7):
-                    try:
-                        text = (await cells[i].inner_text()).strip()
-                    except Exception as cell_error:
-                        print(f"⚠️ Error extracting text from cell {i+1} in row {row_index}: {cell_error}. Using empty string.")
-                        text = ""
-                    row_data.append(text)
-
-                # Extract SteamOSResultStatus from the row's class attribute
-                steam_os_status = "Unknown" # Default status
-                try:
-                    class_attr = await row.get_attribute("class") or ""
-                    classes = class_attr.split()
-
-                    # Check for specific status classes directly
-                    if "verified" in classes:
-                        steam_os_status = "Verified"
-                    elif "playable" in classes:
-                        steam_os_status = "Playable"
-                    elif "unsupported" in classes:
-                        steam_os_status = "Unsupported"
-                    # Keep "Unknown" if none of the above are found
-
-                except Exception as class_error:
-                    print(f"⚠️ Error extracting SteamOSResultStatus from class in row {row_index}: {class_error}")
-                row_data.append(steam_os_status) # Append the derived status
-
-                # Final check for expected column count
-                if len(row_data) != EXPECTED_COLUMNS:
-                    print(f"⚠️ Skipping row {row_index}: Data mismatch. Expected {EXPECTED_COLUMNS} columns, got {len(row_data)}. Data: {row_data}")
-                    continue
-
-                unique_rows[row_index] = row_data
-                processed_rows += 1
-                new_valid_rows_in_batch += 1
-                # print(f"✅ Added row {row_index}. Total unique rows collected this session: {len(unique_rows)}")
-
-            # --- End of processing rows on current page ---
-
-            if processed_rows >= MAX_ROWS:
-                 break # Exit outer loop if max rows reached
-
-            print(f"Batch summary: Processed {new_valid_rows_in_batch} new valid rows from this page view.")
-
-            # Check if we are making progress
-            if current_max_in_page > max_row_seen:
-                max_row_seen = current_max_in_page
-                no_new_rows_count = 0 # Reset counter because we saw higher row indices
-                print(f"📈 Progress: Highest row index seen so far: {max_row_seen}")
-            else:
-                # Only increment no_new_rows_count if we didn't add any *new* rows *and* the max row index didn't increase
-                if new_valid_rows_in_batch == 0:
-                    no_new_rows_count += 1
-                    print(f"⏳ No new rows added and max row index ({max_row_seen}) did not increase. Stall count: {no_new_rows_count}/3.")
+                # Next pass only needs rows past those collected, unless some came back incomplete
+                if incomplete_indices:
+                    min_row_index = min(incomplete_indices)
                 else:
-                     # We added rows, but max didn't increase (maybe filled gaps). Reset counter.
-                     no_new_rows_count = 0
-                     print(f"📊 Added {new_valid_rows_in_batch} rows, but max row index ({max_row_seen}) unchanged.")
-
-
-            if no_new_rows_count >= 3:
-                print("🚨 No new rows detected after 3 consecutive attempts where max row index didn't increase. Assuming end of data.")
-                break # Exit outer loop
-
-            # Write batch to CSV periodically
-            scroll_attempt += 1
-            if scroll_attempt % BATCH_INTERVAL == 0 and unique_rows:
-                # Get keys for rows collected but not yet written
-                keys_to_write = sorted([key for key in unique_rows if key not in written_keys])
-                if keys_to_write:
-                    batch_data = [unique_rows[k] for k in keys_to_write]
-                    df_batch = pd.DataFrame(batch_data, columns=column_names)
-                    is_new_file = not os.path.exists(CSV_FILENAME) or os.path.getsize(CSV_FILENAME) == 0
-                    try:
-                        df_batch.to_csv(CSV_FILENAME, mode='a', header=is_new_file, index=False, encoding='utf-8')
-                        written_keys.update(keys_to_write)
-                        # Clear rows from memory after writing to save resources
-                        for key in keys_to_write:
-                            del unique_rows[key]
-                        print(f"💾 Batch written to {CSV_FILENAME} with {len(batch_data)} rows. Total rows written this session: {len(written_keys)}. Cleared from memory.")
-                    except Exception as write_error:
-                         print(f"🚨 Error writing batch to CSV: {write_error}")
-                else:
-                    print("💾 No new rows collected since last batch write.")
+                    min_row_index = max(min_row_index, max_row_collected + 1)
 
+                if processed_rows >= MAX_ROWS:
+                     break # Exit outer loop if max rows reached
 
-            # Scroll for the next batch
-            print(f"🌀 Scroll attempt {scroll_attempt}. Trying to scroll...")
-            if not await scroll_table():
-                 print("🚨 Scrolling failed. Ending data extraction.")
-                 break # Exit outer loop
+                print(f"Batch summary: Processed {new_valid_rows_in_batch} new valid rows from this page view.")
 
-        # --- End of main extraction loop ---
-
-        # Write any remaining collected rows
-        # Use a different variable name to avoid potential conflicts if 'k' was used elsewhere
-        remaining_keys_final = sorted([key for key in unique_rows if key not in written_keys])
-        if remaining_keys_final:
-            # Use the correct variable 'remaining_keys_final' here
-            remaining_data = [unique_rows[key] for key in remaining_keys_final]
-            df_remaining = pd.DataFrame(remaining_data, columns=column_names)
-            is_new_file = not os.path.exists(CSV_FILENAME) or os.path.getsize(CSV_FILENAME) == 0
-            try:
-                df_remaining.to_csv(CSV_FILENAME, mode='a', header=is_new_file, index=False, encoding='utf-8')
-                # Update written_keys with the keys from the final batch
-                written_keys.update(remaining_keys_final)
-                print(f"💾 Final batch written to {CSV_FILENAME} with {len(remaining_data)} rows.")
-            except Exception as write_error:
-                 print(f"🚨 Error writing final batch to CSV: {write_error}")
+                # Check if we are making progress
+                if current_max_in_page > max_row_seen:
+                    max_row_seen = current_max_in_page
+                    no_new_rows_count = 0 # Reset counter because we saw higher row indices
+                    print(f"📈 Progress: Highest row index seen so far: {max_row_seen}")
+                else:
+                    # Only increment no_new_rows_count if we didn't add any *new* rows *and* the max row index didn't increase
+                    if new_valid_rows_in_batch == 0:
+                        no_new_rows_count += 1
+                        print(f"⏳ No new rows added and max row index ({max_row_seen}) did not increase. Stall count: {no_new_rows_count}/3.")
+                    else:
+                         # We added rows, but max didn't increase (maybe filled gaps). Reset counter.
+                         no_new_rows_count = 0
+                         print(f"📊 Added {new_valid_rows_in_batch} rows, but max row index ({max_row_seen}) unchanged.")
+
+
+                if no_new_rows_count >= 3:
+                    print("🚨 No new rows detected after 3 consecutive attempts where max row index didn't increase. Assuming end of data.")
+                    break # Exit outer loop
+
+                # Write batch to CSV once enough rows are pending
+                if len(pending) >= FLUSH_ROWS:
+                    write_pending()
+
+                # Scroll for the next batch
+                scroll_attempt += 1
+                print(f"🌀 Scroll attempt {scroll_attempt}. Trying to scroll...")
+                if not await scroll_table():
+                     print("🚨 Scrolling failed. Ending data extraction.")
+                     break # Exit outer loop
+        finally:
+            # --- End of main extraction loop (also reached on errors) ---
+
+            # Write any remaining collected rows
+            periodic_flush_task.cancel()
+            await asyncio.gather(periodic_flush_task, return_exceptions=True)
+            if pending:
+                write_pending("Final batch")
+            csv_file.close()
 
-        total_written = len(written_keys)
         print(f"✅ Data extraction complete. Total rows written in this session: {total_written}. Data saved in '{CSV_FILENAME}'.")
 
         # --- Cleanup --- 